@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+from models import resource_id, to_epoch_seconds, from_epoch_seconds
+from planner import OPEN_SERIES_HORIZON
+from timeline import TIME_OFFSET
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#Reporte de uso por recurso y por pool: ocupacion por dia o semana, concurrencia pico y huecos ociosos.
+#Las ocupaciones de cada recurso (eventos sueltos y ocurrencias de series) se pasan a arreglos de NumPy
+#(inicios, fines, unidades) y todo lo demas sale de un solo perfil de ocupacion: los inicios suman unidades,
+#los fines restan, y una suma acumulada da las unidades en uso entre cada par de instantes.
+#NumPy es opcional para el resto del planner; sin NumPy el reporte no esta disponible (ver AVAILABLE)
+
+AVAILABLE = np is not None
+PERIODS = {"day": timedelta(days=1), "week": timedelta(weeks=1)}
+#Limites (en minutos) de las barras del histograma de huecos; la ultima barra junta todo lo que pasa del dia
+GAP_BINS = (0, 15, 30, 60, 120, 240, 480, 1440)
+
+
+def usage_report(planner, start_time=None, end_time=None, period="day", names=None):
+    #Devuelve {start, end, period, resources: {nombre: metricas}}. Sin rango se toma desde la primera
+    #ocupacion hasta la ultima (las series sin fin, hasta OPEN_SERIES_HORIZON a partir de hoy)
+    names = list(names) if names is not None else list(planner.available_resources) + list(planner.resource_pools)
+    start_key = None if start_time is None else to_epoch_seconds(start_time)
+    end_key = None if end_time is None else to_epoch_seconds(end_time)
+    if end_key is None:
+        end_key = to_epoch_seconds(datetime.now() + OPEN_SERIES_HORIZON)
+    intervals = {name: _intervals(planner, resource_id(name), start_key, end_key, name in planner.resource_pools) for name in names}
+    if start_time is None or end_time is None:
+        used = [arrays for arrays in intervals.values() if arrays[0].size]
+        if used:
+            if start_time is None:
+                start_key = int(min(starts.min() for starts, ends, units in used))
+            if end_time is None:
+                end_key = int(max(ends.max() for starts, ends, units in used))
+        if start_key is None:
+            start_key = end_key = to_epoch_seconds(datetime.now())
+    boundaries = _boundaries(start_key, end_key, PERIODS[period])
+    labels = [from_epoch_seconds(int(cut)).isoformat() for cut in boundaries[:-1]]
+    resources = {}
+    for name, (starts, ends, units) in intervals.items():
+        capacity = planner.resource_pools.get(name)
+        resources[name] = _metrics(np.clip(starts, start_key, end_key), np.clip(ends, start_key, end_key), units,
+                                   capacity or 1, boundaries, labels)
+        resources[name]["pool"] = capacity is not None
+    return {
+        "start": from_epoch_seconds(start_key).isoformat(),
+        "end": from_epoch_seconds(end_key).isoformat(),
+        "period": period,
+        "resources": resources,
+    }
+
+
+def _intervals(planner, rid, start_key, end_key, is_pool):
+    #(inicios, fines, unidades) de las ocupaciones del recurso que se solapan con [start_key, end_key).
+    #Solo en los pools un evento puede ocupar mas de una unidad
+    timeline = planner.resource_timelines.get(rid)
+    singles = []
+    if timeline is not None:
+        singles = list(timeline.iter_overlapping(-TIME_OFFSET if start_key is None else start_key, end_key))
+    starts = [np.fromiter((ev.start_key for ev in singles), dtype=np.int64, count=len(singles))]
+    ends = [np.fromiter((ev.end_key for ev in singles), dtype=np.int64, count=len(singles))]
+    if is_pool:
+        units = [np.fromiter((planner._units(ev, rid) for ev in singles), dtype=np.int64, count=len(singles))]
+    else:
+        units = [np.ones(len(singles), dtype=np.int64)]
+    for master in planner.resource_series.get(rid, {}).values():
+        rule = master.recurrence_rule()
+        span = rule.index_range(rule.start_key if start_key is None else start_key, end_key)
+        indices = np.arange(span.start, span.stop, dtype=np.int64)
+        if rule.cancelled:
+            indices = indices[~np.isin(indices, np.fromiter(rule.cancelled, dtype=np.int64))]
+        occurrence_starts = rule.start_key + indices * rule.step
+        starts.append(occurrence_starts)
+        ends.append(occurrence_starts + rule.duration)
+        units.append(np.full(indices.size, planner._units(master, rid), dtype=np.int64))
+    return np.concatenate(starts), np.concatenate(ends), np.concatenate(units)
+
+
+def _boundaries(start_key, end_key, period):
+    #Cortes de los periodos alineados a la medianoche (las semanas, al lunes), recortados a la ventana
+    first = from_epoch_seconds(start_key).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == PERIODS["week"]:
+        first -= timedelta(days=first.weekday())
+    step = int(period.total_seconds())
+    cuts = np.arange(to_epoch_seconds(first), end_key + step, step, dtype=np.int64)
+    cuts = np.clip(cuts, start_key, end_key)
+    return np.unique(cuts)
+
+
+def _profile(starts, ends, units):
+    #Instantes ordenados y unidades en uso a partir de cada uno (los fines van antes que los inicios
+    #del mismo instante, asi dos trabajos seguidos no cuentan como concurrentes)
+    times = np.concatenate((starts, ends))
+    deltas = np.concatenate((units, -units))
+    order = np.lexsort((deltas, times))
+    return times[order], np.cumsum(deltas[order])
+
+
+def _metrics(starts, ends, units, capacity, boundaries, labels):
+    keep = ends > starts
+    starts, ends, units = starts[keep], ends[keep], units[keep]
+    window = int(boundaries[-1] - boundaries[0])
+    period_lengths = np.diff(boundaries)
+    metrics = {"capacity": capacity, "bookings": int(starts.size)}
+    if not starts.size:
+        metrics.update(busy_hours=0.0, utilization=0.0, peak=0, peak_at=None,
+                       periods=[(label, 0.0) for label in labels],
+                       gaps={"count": 0, "mean_minutes": 0.0, "max_minutes": 0.0, "histogram": [0] * len(GAP_BINS)})
+        return metrics
+    times, level = _profile(starts, ends, units)
+    lengths = np.diff(times)
+    segment_level = level[:-1]
+    #Unidad-segundos acumulados hasta cada instante; en cualquier corte t se interpolan con el nivel vigente
+    used = np.concatenate(([0], np.cumsum(lengths * segment_level)))
+    position = np.searchsorted(times, boundaries, side="right") - 1
+    inside = position >= 0
+    position = np.maximum(position, 0)
+    at_cut = np.where(inside, used[position] + (boundaries - times[position]) * level[position], 0)
+    per_period = np.diff(at_cut) / (capacity * np.maximum(period_lengths, 1))
+    gaps = lengths[(segment_level == 0) & (lengths > 0)] / 60
+    histogram, _ = np.histogram(gaps, bins=GAP_BINS + (np.inf,))
+    peak = int(np.argmax(level))
+    metrics.update(
+        busy_hours=float(lengths[segment_level > 0].sum() / 3600),
+        utilization=float(used[-1] / (capacity * max(window, 1))),
+        peak=int(level[peak]),
+        peak_at=from_epoch_seconds(int(times[peak])).isoformat(),
+        periods=list(zip(labels, per_period.tolist())),
+        gaps={"count": int(gaps.size), "mean_minutes": float(gaps.mean()) if gaps.size else 0.0,
+              "max_minutes": float(gaps.max()) if gaps.size else 0.0, "histogram": histogram.tolist()},
+    )
+    return metrics
+
+
+def report_lines(report):
+    lines = [f"Uso de recursos del {report['start']} al {report['end']} (por {'dia' if report['period'] == 'day' else 'semana'})"]
+    labels = [f"<{GAP_BINS[i+1]}m" for i in range(len(GAP_BINS) - 1)] + [f">={GAP_BINS[-1]}m"]
+    for name, m in report["resources"].items():
+        kind = f"pool x{m['capacity']}" if m["pool"] else "recurso"
+        lines.append(f"- {name} ({kind}): {m['bookings']} ocupaciones, {m['busy_hours']:.1f} h ocupado, "
+                     f"uso {m['utilization']:.1%}, pico {m['peak']}" + (f" ({m['peak_at']})" if m["peak_at"] else ""))
+        if not m["bookings"]:
+            continue
+        busiest, top = max(m["periods"], key=lambda period: period[1])
+        active = sum(1 for start, used in m["periods"] if used)
+        lines.append(f"    por periodo: {active} de {len(m['periods'])} con uso, el mas cargado {busiest[:10]} ({top:.0%})")
+        gaps = m["gaps"]
+        if gaps["count"]:
+            lines.append(f"    huecos: {gaps['count']} (promedio {gaps['mean_minutes']:.0f} min, maximo {gaps['max_minutes']:.0f} min) | "
+                         + " ".join(f"{label}:{count}" for label, count in zip(labels, gaps["histogram"])))
+    return lines
@@ -0,0 +1,135 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from models import from_epoch_seconds, to_epoch_seconds
+from planner import Planner
+from storage import SAVE_DIR, event_record, event_from_record
+from timeline import TIME_OFFSET
+
+#Archivo historico del taller particionado por mes: los eventos que terminaron antes del horizonte activo
+#salen del planner (y de data.json) a un shard comprimido por mes de inicio, save/archive/AAAA-MM.jsonl.gz
+#(un evento por linea, mismo formato que data.json). index.json guarda por shard la cantidad de eventos y el
+#primer inicio y el ultimo fin, asi una consulta historica abre solo los meses que se solapan con su rango.
+#Al iniciar se carga solo el estado activo: el costo de cargar, guardar y listar no crece con los anios
+
+ARCHIVE_DIR = os.path.join(SAVE_DIR, "archive")
+INDEX_FILE = "index.json"
+#Los eventos (y series con fin) que terminaron hace mas que esto se archivan al compactar
+ACTIVE_HORIZON = timedelta(days=90)
+
+
+class ShardArchive:
+    def __init__(self, directory=ARCHIVE_DIR, horizon=ACTIVE_HORIZON):
+        self.directory = directory
+        self.horizon = horizon
+        self.index = None
+
+    def archive_expired(self, planner, now=None):
+        return self.archive_before(planner, (now or datetime.now()) - self.horizon)
+
+    def archive_before(self, planner, cutoff):
+        #Mueve al archivo los eventos que terminan hasta 'cutoff' y las series con fin cuya ultima ocurrencia
+        #termina hasta ahi (las series sin fin o que siguen activas quedan en el planner).
+        #Devuelve (eventos archivados, meses tocados)
+        cutoff_key = to_epoch_seconds(cutoff)
+        expired = [ev for ev in planner.event_timeline.iter_overlapping(-TIME_OFFSET, cutoff_key) if ev.end_key <= cutoff_key]
+        for master in planner.series_index.values():
+            rule = master.recurrence_rule()
+            if rule.count is not None and rule.end_key <= cutoff_key:
+                expired.append(master)
+        if not expired:
+            return 0, 0
+        months = {}
+        for ev in expired:
+            months.setdefault(shard_name(ev.start_time), []).append(ev)
+        #Primero los shards en disco y despues se quitan del planner: si algo falla a mitad, los eventos
+        #quedan en los dos lados y el siguiente archivado los vuelve a escribir sin duplicarlos (por id)
+        index = self._load_index()
+        for month, events in months.items():
+            records = {record["id"]: record for record in self._read_shard(month)}
+            for ev in events:
+                records[ev.event_id] = event_record(ev)
+            self._write_shard(month, list(records.values()))
+            index[month] = shard_summary(records.values())
+        self._save_index(index)
+        with planner.stats.timer("archive"):
+            for ev in expired:
+                planner.remove_event(ev)
+        planner.stats.count("archived_events", len(expired))
+        return len(expired), len(months)
+
+    def events_between(self, start_time=None, end_time=None, resource_name=None):
+        #Consulta historica: eventos archivados (con las ocurrencias de las series) que se solapan con el rango,
+        #de todo el taller o de un recurso, ordenados por inicio. Solo se leen los shards del rango
+        history = Planner()
+        history.restore_events([event_from_record(record) for month in self.shards_between(start_time, end_time)
+                                for record in self._read_shard(month)])
+        if resource_name is None:
+            return history.events_between(start_time, end_time)
+        return history.agenda(resource_name, start_time, end_time)
+
+    def shards_between(self, start_time=None, end_time=None):
+        shards = []
+        for month, summary in sorted(self._load_index().items()):
+            if end_time is not None and datetime.fromisoformat(summary["start"]) >= end_time:
+                continue
+            if start_time is not None and datetime.fromisoformat(summary["end"]) <= start_time:
+                continue
+            shards.append(month)
+        return shards
+
+    def _read_shard(self, month):
+        filename = os.path.join(self.directory, f"{month}.jsonl.gz")
+        if not os.path.exists(filename):
+            return []
+        with gzip.open(filename, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _write_shard(self, month, records):
+        os.makedirs(self.directory, exist_ok=True)
+        filename = os.path.join(self.directory, f"{month}.jsonl.gz")
+        records.sort(key=lambda record: (record["start"], record["id"]))
+        #Igual que el snapshot: archivo temporal, fsync y reemplazo
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, "wb") as raw:
+            with gzip.open(raw, "wt", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_filename, filename)
+
+    def _load_index(self):
+        if self.index is None:
+            filename = os.path.join(self.directory, INDEX_FILE)
+            self.index = {}
+            if os.path.exists(filename):
+                with open(filename, "r", encoding="utf-8") as f:
+                    self.index = json.load(f)
+        return self.index
+
+    def _save_index(self, index):
+        filename = os.path.join(self.directory, INDEX_FILE)
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+        self.index = index
+
+
+def shard_name(moment):
+    return moment.strftime("%Y-%m")
+
+
+def shard_summary(records):
+    #Cantidad de eventos, primer inicio y ultimo fin del shard (el fin de una serie es el de su ultima ocurrencia)
+    starts, ends = [], []
+    for record in records:
+        ev = event_from_record(record)
+        rule = ev.recurrence_rule()
+        starts.append(ev.start_time)
+        ends.append(ev.end_time if rule is None else from_epoch_seconds(rule.end_key))
+    return {"events": len(starts), "start": min(starts).isoformat(), "end": max(ends).isoformat()}
@@ -0,0 +1,249 @@
+import argparse
+import heapq
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from models import Resource, resource_id, resource_name, to_epoch_seconds, from_epoch_seconds
+from planner import Planner, OPEN_SERIES_HORIZON
+from storage import DEFAULT_FILE, read_state_file, event_from_record
+
+#Auditoria del estado completo (un data.json tal cual esta en disco, o el planner en memoria): revisa cada
+#evento contra recursos, restricciones y catalogo, y los choques por recurso con un barrido ordenado
+#(sort-and-sweep) por recurso en vez de comparar pares. Cada recurso se barre por separado, asi el trabajo
+#se reparte entre procesos. Uso: python audit.py [save/data.json] [--workers 4] [--json reporte.json]
+
+#Por debajo de estas ocupaciones se audita en el proceso actual (levantar procesos cuesta mas que barrer)
+PARALLEL_THRESHOLD = 50000
+#Conflictos que se muestran en pantalla; el reporte JSON los trae todos
+PRINT_LIMIT = 50
+
+
+def audit_state(data, workers=None, job_catalog=None):
+    #Devuelve el reporte: conteos, tiempo y la lista de conflictos. Cada conflicto es un dict con
+    #type (unknown, resource, pool, restriction, catalog, duplicate_id), resource, events (ids), titles,
+    #start, end y message; los de pools agregan capacity e in_use
+    started = time.perf_counter()
+    planner = Planner()
+    if job_catalog is not None:
+        planner.job_catalog = job_catalog
+    restrictions = data.get("restrictions", {})
+    for a, b in restrictions.get("corequisite", []):
+        planner.add_corequisite(a, b)
+    for a, b in restrictions.get("exclusion", []):
+        planner.add_exclusion(a, b)
+    for pool, qty in data.get("pools", {}).items():
+        planner.set_pool(pool, qty)
+    for r in data.get("resources", []):
+        planner.add_resource(Resource(r["name"], r.get("attributes")))
+    events = [event_from_record(e) for e in data.get("events", [])]
+    planner.assign_event_ids(events)
+
+    conflicts = []
+    seen_ids = set()
+    known = {resource_id(name) for name in planner.available_resources} | {resource_id(name) for name in planner.resource_pools}
+    horizon = to_epoch_seconds(datetime.now() + OPEN_SERIES_HORIZON)
+    #Recurso -> (eventos sueltos como (inicio, fin, id, titulo, unidades), series como (id, titulo, regla, unidades))
+    bookings = {}
+    for ev in events:
+        if ev.event_id in seen_ids:
+            conflicts.append(_conflict("duplicate_id", None, [(ev.start_key, ev.end_key, ev.ref, ev.event_title)],
+                                       ev.start_key, ev.end_key, f"Id repetido: {ev.event_id}"))
+        seen_ids.add(ev.event_id)
+        rule = ev.recurrence_rule()
+        probe = ev
+        if rule is not None:
+            first = rule.first_active_index()
+            if first is None:
+                continue
+            probe = ev.occurrence(first)
+        else:
+            horizon = max(horizon, ev.end_key)
+        kind, msg = planner.check_rules(probe)
+        if kind is not None:
+            conflicts.append(_conflict(kind, None, [(probe.start_key, probe.end_key, probe.ref, probe.event_title)],
+                                       probe.start_key, probe.end_key, msg))
+        for rid, units in _demand(planner, ev).items():
+            if rid not in known:
+                continue
+            singles, series = bookings.setdefault(rid, ([], []))
+            if rule is None:
+                singles.append((ev.start_key, ev.end_key, ev.ref, ev.event_title, units))
+            else:
+                series.append((ev.event_id, ev.event_title, rule, units))
+
+    tasks = []
+    for rid, (singles, series) in bookings.items():
+        name = resource_name(rid)
+        size = len(singles) + sum(_estimated_occurrences(rule, horizon) for event_id, title, rule, units in series)
+        tasks.append((size, (name, planner.resource_pools.get(name), singles, series, horizon)))
+    #Los recursos mas cargados primero, para repartir mejor entre procesos
+    tasks.sort(key=lambda task: -task[0])
+    total = sum(size for size, task in tasks)
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(tasks)) if total >= PARALLEL_THRESHOLD else 1
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_sweep_resource, [task for size, task in tasks]))
+    else:
+        results = [_sweep_resource(task) for size, task in tasks]
+
+    checked = 0
+    swept = []
+    for count, found in results:
+        checked += count
+        swept.extend(found)
+    swept.sort(key=lambda c: (c["start"], c["resource"], c["events"]))
+    conflicts.extend(swept)
+    by_type = {}
+    for c in conflicts:
+        by_type[c["type"]] = by_type.get(c["type"], 0) + 1
+    return {
+        "checked_at": datetime.now().isoformat(timespec="seconds"),
+        "events": len(events),
+        "occurrences": checked,
+        "resources": len(tasks),
+        "workers": workers,
+        "elapsed": time.perf_counter() - started,
+        "by_type": dict(sorted(by_type.items())),
+        "conflicts": conflicts,
+    }
+
+
+def audit_file(filename=DEFAULT_FILE, workers=None, job_catalog=None):
+    return audit_state(read_state_file(filename), workers, job_catalog)
+
+
+def _demand(planner, ev):
+    #Recurso -> unidades que ocupa el evento (o cada ocurrencia de la serie), las mismas que reserva el
+    #planner: los pools salen de _pool_units_needed (incluye los que pide el trabajo del catalogo)
+    demand = planner._pool_units_needed(ev)
+    for rid in ev.resource_ids:
+        demand.setdefault(rid, ev.units_of(rid))
+    return demand
+
+
+def _estimated_occurrences(rule, horizon):
+    if rule.count is not None:
+        return rule.count
+    return max((horizon - rule.start_key) // rule.step + 1, 0)
+
+
+def _sweep_resource(task):
+    #Corre en los procesos del pool: expande las series del recurso y lo barre. Devuelve (ocupaciones, conflictos)
+    name, capacity, singles, series, horizon = task
+    intervals = list(singles)
+    for event_id, title, rule, units in series:
+        for index in rule.indices_between(rule.start_key, horizon if rule.count is None else None):
+            start = rule.occurrence_start(index)
+            intervals.append((start, start + rule.duration, f"{event_id}#{index+1}", f"{title} (#{index+1})", units))
+    intervals.sort()
+    if capacity is None:
+        return len(intervals), _overlaps(name, intervals)
+    return len(intervals), _overflows(name, capacity, intervals)
+
+
+def _overlaps(name, intervals):
+    #Recurso exclusivo: al avanzar por inicio se quitan del monticulo los que ya terminaron; los que quedan
+    #se solapan con el actual. O(n log n + conflictos)
+    found = []
+    active = []
+    for position, (start, end, ref, title, units) in enumerate(intervals):
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for other_end, other in active:
+            found.append(_conflict("resource", name, [intervals[other], intervals[position]], start, min(end, other_end),
+                                   f"'{intervals[other][3]}' y '{title}' usan '{name}' al mismo tiempo"))
+        heapq.heappush(active, (end, position))
+    return found
+
+
+def _overflows(name, capacity, intervals):
+    #Pool: barrido por instantes (los fines antes que los inicios del mismo instante); cada tramo continuo en
+    #el que las unidades en uso superan la capacidad es un conflicto con todos los eventos que participan
+    points = []
+    for position, (start, end, ref, title, units) in enumerate(intervals):
+        points.append((start, 1, position))
+        points.append((end, 0, position))
+    points.sort()
+    found = []
+    in_use = 0
+    active = set()
+    overflow = None
+    i = 0
+    while i < len(points):
+        moment = points[i][0]
+        while i < len(points) and points[i][0] == moment:
+            _, starts, position = points[i]
+            if starts:
+                in_use += intervals[position][4]
+                active.add(position)
+            else:
+                in_use -= intervals[position][4]
+                active.discard(position)
+            i += 1
+        if in_use > capacity:
+            if overflow is None:
+                overflow = [moment, in_use, set(active)]
+            else:
+                overflow[1] = max(overflow[1], in_use)
+                overflow[2].update(active)
+        elif overflow is not None:
+            start, peak, members = overflow
+            conflict = _conflict("pool", name, [intervals[p] for p in sorted(members)], start, moment,
+                                 f"'{name}' usa {peak} de {capacity} unidades")
+            conflict["capacity"] = capacity
+            conflict["in_use"] = peak
+            found.append(conflict)
+            overflow = None
+    return found
+
+
+def _conflict(kind, resource, intervals, start_key, end_key, message):
+    return {
+        "type": kind,
+        "resource": resource,
+        "events": [entry[2] for entry in intervals],
+        "titles": [entry[3] for entry in intervals],
+        "start": from_epoch_seconds(start_key).isoformat(),
+        "end": from_epoch_seconds(end_key).isoformat(),
+        "message": message,
+    }
+
+
+def report_lines(report, limit=PRINT_LIMIT):
+    lines = [f"{report['events']} eventos, {report['occurrences']} ocupaciones revisadas en {report['resources']} recursos "
+             f"({report['workers']} proceso(s), {report['elapsed']:.2f} s): {len(report['conflicts'])} conflicto(s)"]
+    if report["by_type"]:
+        lines.append("  " + ", ".join(f"{kind}: {count}" for kind, count in report["by_type"].items()))
+    for c in report["conflicts"][:limit]:
+        where = f" | {c['resource']}" if c["resource"] else ""
+        lines.append(f"  [{c['type']}] {c['start']} => {c['end']}{where} | eventos {', '.join(c['events'])} | {c['message']}")
+    if len(report["conflicts"]) > limit:
+        lines.append(f"  ... y {len(report['conflicts']) - limit} mas (ver el reporte JSON)")
+    return lines
+
+
+def write_report(report, filename):
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auditoria de conflictos del estado de Ctrl + Alt + Repair")
+    parser.add_argument("file", nargs="?", default=DEFAULT_FILE)
+    parser.add_argument("--workers", type=int, help="procesos para barrer los recursos (por defecto, todos los nucleos)")
+    parser.add_argument("--json", help="guarda el reporte completo en este archivo")
+    args = parser.parse_args(argv)
+
+    report = audit_file(args.file, args.workers)
+    for line in report_lines(report):
+        print(line)
+    if args.json:
+        write_report(report, args.json)
+    return 1 if report["conflicts"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
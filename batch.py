@@ -0,0 +1,150 @@
+import csv
+import json
+from datetime import datetime, timedelta
+from models import Event
+
+#Modo por lotes: los trabajos llegan como filas CSV o JSONL y pasan por una cadena de generadores
+#(leer -> convertir en eventos -> agendar en bloques) que escribe un resultado JSONL por fila.
+#Solo hay en memoria un bloque de CHUNK_SIZE filas a la vez, sin importar el tamano de la entrada.
+#Columnas: title, start, end, resources (separados por ';' en CSV), client, notes, status,
+#recurrence (daily/weekly/monthly), count, until y duration_minutes. Sin resources el trabajo del catalogo
+#se asigna solo (auto_assign) a partir de start, con la duracion de end o de duration_minutes
+
+#Filas que se validan juntas con schedule_many
+CHUNK_SIZE = 1000
+
+
+def read_rows(stream, fmt):
+    #Genera (numero de linea, dict) sin leer toda la entrada
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, {"_error": f"JSON invalido: {e}"}
+
+
+def parse_rows(rows):
+    #Genera (numero de linea, trabajo, error); trabajo es un Event listo para validar, o
+    #(titulo, desde, duracion, metadatos) cuando hay que asignarle los recursos
+    for line_number, row in rows:
+        try:
+            yield line_number, _row_job(row), None
+        except (KeyError, ValueError, TypeError) as e:
+            yield line_number, None, _error_text(e)
+
+
+def _row_job(row):
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    title = (row.get("title") or "").strip()
+    if not title:
+        raise ValueError("Falta el titulo")
+    metadata = {key: row[key] for key in ("client", "notes", "status") if row.get(key)}
+    resources = row.get("resources") or []
+    if isinstance(resources, str):
+        resources = [name.strip() for name in resources.split(";") if name.strip()]
+    start = _moment(row.get("start"), "start")
+    if row.get("end"):
+        end = _moment(row["end"], "end")
+    elif row.get("duration_minutes"):
+        end = start + timedelta(minutes=float(row["duration_minutes"]))
+    else:
+        raise ValueError("Falta end o duration_minutes")
+    if not resources:
+        if end <= start:
+            raise ValueError("El tiempo de finalizacion debe ser despues del de inicio")
+        return title, start, end - start, metadata
+    recurrence = None
+    if row.get("recurrence"):
+        recurrence = {"freq": row["recurrence"]}
+        if row.get("count"):
+            recurrence["count"] = int(row["count"])
+        if row.get("until"):
+            _moment(row["until"], "until")
+            recurrence["until"] = row["until"]
+    return Event(title, start, end, resources, metadata, recurrence)
+
+
+def _moment(value, field):
+    if not value:
+        raise ValueError(f"Falta {field}")
+    try:
+        return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Fecha invalida en {field}: '{value}' (usa YYYY-MM-DDTHH:MM:SS)")
+
+
+def _error_text(error):
+    if isinstance(error, KeyError):
+        return f"Falta el campo {error}"
+    return str(error)
+
+
+def schedule_rows(planner, parsed, chunk_size=CHUNK_SIZE):
+    #Genera un resultado (dict) por fila. Los eventos con recursos se validan y agregan por bloques con
+    #schedule_many (atomic=False); una fila sin recursos primero vacia el bloque, asi se asigna contra el
+    #estado que dejaron las filas anteriores
+    chunk = []
+    for line_number, job, error in parsed:
+        if job is None or isinstance(job, Event):
+            chunk.append((line_number, job, error))
+            if len(chunk) >= chunk_size:
+                yield from _flush(planner, chunk)
+                chunk = []
+        else:
+            yield from _flush(planner, chunk)
+            chunk = []
+            yield _auto(planner, line_number, job)
+    yield from _flush(planner, chunk)
+
+
+def _flush(planner, chunk):
+    #Los resultados salen en el orden de las filas; las que no se pudieron leer solo se reportan
+    events = [job for line_number, job, error in chunk if job is not None]
+    report = iter(planner.schedule_many(events, atomic=False)[1] if events else ())
+    for line_number, job, error in chunk:
+        if job is None:
+            yield {"line": line_number, "ok": False, "message": error}
+        else:
+            event, accepted, msg = next(report)
+            yield _result(line_number, event, accepted, msg)
+
+
+def _auto(planner, line_number, job):
+    title, search_from, duration, metadata = job
+    event, msg = planner.auto_assign(title, duration, search_from, event_metadata=metadata)
+    if event is None:
+        return {"line": line_number, "ok": False, "title": title, "message": msg}
+    accepted, msg = planner.schedule_event(event)
+    return _result(line_number, event, accepted, msg)
+
+
+def _result(line_number, event, accepted, msg):
+    result = {"line": line_number, "ok": accepted, "title": event.event_title}
+    if accepted:
+        result["id"] = event.ref
+        result["start"] = event.start_time.isoformat()
+        result["end"] = event.end_time.isoformat()
+        result["resources"] = event.required_resources
+    result["message"] = msg
+    return result
+
+
+def run_pipeline(planner, stream, out, fmt="jsonl", chunk_size=CHUNK_SIZE):
+    #Lee, agenda y escribe cada resultado apenas esta listo. Devuelve (filas, agendadas)
+    rows = 0
+    scheduled = 0
+    for result in schedule_rows(planner, parse_rows(read_rows(stream, fmt)), chunk_size):
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        rows += 1
+        scheduled += result["ok"]
+    out.flush()
+    return rows, scheduled
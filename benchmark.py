@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from models import Event, Resource
+from planner import Planner
+from storage import save_planner_state, load_planner_state
+
+#Benchmark del planner: genera un taller sintetico con la forma de cli.seed_domain (tecnicos por skill,
+#herramientas, dispositivos, pools y trabajos del catalogo) y mide cada operacion.
+#Uso: python benchmark.py --techs 20 --pools 3 --events 5000 --output res.json [--baseline otro.json]
+
+SKILLS = ["Hardware Specialist", "Software Specialist", "Data Recovery Expert", "Programador"]
+TOOLS = ["Estacion de Soldadura", "Horno de Reflow", "Kit Antiestatico"]
+DEVICES = ["Banco de Pruebas Sensible", "PC cliente", "PC de desarrollo"]
+FREQUENCIES = ["daily", "weekly", "monthly"]
+BASE_TIME = datetime(2025, 1, 6, 8, 0)
+#Operaciones que se comparan contra la linea base (latencia p50 y throughput)
+DEFAULT_THRESHOLD = 1.25
+
+
+def build_workshop(techs=20, pools=3, seed=0):
+    rnd = random.Random(seed)
+    planner = Planner()
+    tech_names = []
+    for i in range(techs):
+        skill = SKILLS[i % len(SKILLS)]
+        name = f"Tecnico {i} ({skill})"
+        planner.add_resource(Resource(name, {"type": "tech", "skills": [skill]}))
+        tech_names.append(name)
+    for tool in TOOLS:
+        planner.add_resource(Resource(tool, {"type": "tool"}))
+    for device in DEVICES:
+        planner.add_resource(Resource(device, {"type": "device"}))
+    pool_names = []
+    for i in range(pools):
+        name = "Mesa de trabajo" if i == 0 else f"Mesa de trabajo {i+1}"
+        planner.set_pool(name, rnd.randint(2, 4))
+        pool_names.append(name)
+    planner.add_exclusion("Horno de Reflow", "Banco de Pruebas Sensible")
+    return planner, tech_names, pool_names
+
+
+def generate_events(tech_names, pool_names, count, recurring=0.1, conflicts=0.2, seed=0):
+    #Cada tecnico avanza con su propio cursor de tiempo (eventos sin choque entre si); una fraccion 'conflicts'
+    #se pone a proposito encima de un evento anterior del mismo tecnico y una fraccion 'recurring' es una serie
+    rnd = random.Random(seed)
+    cursors = {name: BASE_TIME for name in tech_names}
+    previous = {name: [] for name in tech_names}
+    events = []
+    for i in range(count):
+        tech = rnd.choice(tech_names)
+        duration = timedelta(minutes=30 * rnd.randint(1, 6))
+        if previous[tech] and rnd.random() < conflicts:
+            start = rnd.choice(previous[tech]) + timedelta(minutes=15)
+        else:
+            start = cursors[tech] + timedelta(minutes=30 * rnd.randint(0, 4))
+            cursors[tech] = start + duration
+            previous[tech].append(start)
+        resources = [tech]
+        if pool_names and rnd.random() < 0.5:
+            resources.insert(0, rnd.choice(pool_names))
+        if rnd.random() < 0.2:
+            resources.append(rnd.choice(TOOLS + DEVICES))
+        pattern = None
+        if rnd.random() < recurring:
+            pattern = {"freq": rnd.choice(FREQUENCIES), "count": rnd.randint(2, 8)}
+        events.append(Event(f"Trabajo {i}", start, start + duration, resources, {"client": f"Cliente {i % 97}"}, pattern))
+    return events
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    total = sum(samples)
+    return {
+        "calls": len(samples),
+        "total_s": total,
+        "ops_per_s": len(samples) / total if total else 0.0,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "max_ms": samples[-1] * 1000 if samples else 0.0,
+    }
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def run_benchmark(techs=20, pools=3, events=5000, recurring=0.1, conflicts=0.2, probes=500, repeat=5, seed=0):
+    rnd = random.Random(seed + 1)
+    samples = {"schedule_event": [], "validate_event": [], "validate_event_repeat": [], "find_next_available_slot": [],
+               "list_scheduled_events": [], "events_between_day": [], "save_planner_state": [], "load_planner_state": [],
+               "load_planner_state_trusted": []}
+    planner, tech_names, pool_names = build_workshop(techs, pools, seed)
+    generated = generate_events(tech_names, pool_names, events, recurring, conflicts, seed)
+    accepted = 0
+    for ev in generated:
+        elapsed, (ok, msg) = timed(planner.schedule_event, ev)
+        samples["schedule_event"].append(elapsed)
+        accepted += ok
+
+    probe_events = generate_events(tech_names, pool_names, probes, 0, conflicts, seed + 2)
+    for ev in probe_events:
+        samples["validate_event"].append(timed(planner.validate_event, ev)[0])
+    #Las mismas consultas otra vez, como cuando se repite slot/add con pocas variaciones: salen del cache
+    for ev in probe_events:
+        samples["validate_event_repeat"].append(timed(planner.validate_event, ev)[0])
+    cache = planner.validation_cache.info()
+    for ev in probe_events[:max(probes // 5, 1)]:
+        search_from = BASE_TIME + timedelta(hours=rnd.randint(0, 24 * 30))
+        samples["find_next_available_slot"].append(timed(planner.find_next_available_slot, ev, search_from)[0])
+    for _ in range(repeat):
+        samples["list_scheduled_events"].append(timed(planner.list_scheduled_events)[0])
+    for _ in range(max(probes // 5, 1)):
+        day = BASE_TIME + timedelta(days=rnd.randint(0, 60))
+        samples["events_between_day"].append(timed(planner.events_between, day, day + timedelta(days=1))[0])
+
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, "bench.json")
+        for _ in range(repeat):
+            samples["save_planner_state"].append(timed(save_planner_state, planner, filename)[0])
+        for _ in range(repeat):
+            samples["load_planner_state"].append(timed(load_planner_state, Planner(), filename)[0])
+            samples["load_planner_state_trusted"].append(timed(load_planner_state, Planner(), filename, True)[0])
+
+    #Memoria pico: se vuelve a construir el taller con tracemalloc activo (no afecta las mediciones de tiempo)
+    tracemalloc.start()
+    planner, tech_names, pool_names = build_workshop(techs, pools, seed)
+    planner.schedule_many(generate_events(tech_names, pool_names, events, recurring, conflicts, seed), atomic=False)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "commit": current_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "params": {"techs": techs, "pools": pools, "events": events, "recurring": recurring,
+                   "conflicts": conflicts, "probes": probes, "repeat": repeat, "seed": seed},
+        "accepted_events": accepted,
+        "peak_memory_kb": peak // 1024,
+        "validation_cache": cache,
+        "results": {name: summarize(values) for name, values in samples.items()},
+    }
+
+
+def current_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    #Devuelve las regresiones: operaciones cuya p50 crecio o cuyo throughput cayo mas que 'threshold' veces
+    regressions = []
+    if baseline.get("params") != report["params"]:
+        print("Aviso: la linea base se midio con otros parametros, la comparacion no es exacta.")
+    for name, current in report["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or not old["p50_ms"] or not current["ops_per_s"]:
+            continue
+        if current["p50_ms"] > old["p50_ms"] * threshold or old["ops_per_s"] > current["ops_per_s"] * threshold:
+            regressions.append((name, old, current))
+    old_memory = baseline.get("peak_memory_kb")
+    if old_memory and report["peak_memory_kb"] > old_memory * threshold:
+        regressions.append(("peak_memory_kb", {"p50_ms": old_memory}, {"p50_ms": report["peak_memory_kb"]}))
+    return regressions
+
+
+def print_report(report):
+    params = report["params"]
+    print(f"Commit {report['commit']} | {params['techs']} tecnicos, {params['pools']} pools, {params['events']} eventos "
+          f"({report['accepted_events']} aceptados) | memoria pico {report['peak_memory_kb']} KiB")
+    cache = report.get("validation_cache")
+    if cache:
+        print(f"Cache de validaciones: {cache['hits']} aciertos, {cache['misses']} fallos ({cache['stale']} vencidas), "
+              f"{cache['hit_rate']:.0%} aciertos, {cache['evictions']} desalojos")
+    print(f"{'operacion':<28}{'llamadas':>9}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, stats in report["results"].items():
+        print(f"{name:<28}{stats['calls']:>9}{stats['ops_per_s']:>12.1f}{stats['p50_ms']:>10.3f}"
+              f"{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['max_ms']:>10.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del planificador Ctrl + Alt + Repair")
+    parser.add_argument("--techs", type=int, default=20)
+    parser.add_argument("--pools", type=int, default=3)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--recurring", type=float, default=0.1, help="fraccion de eventos que son series")
+    parser.add_argument("--conflicts", type=float, default=0.2, help="fraccion de eventos que chocan a proposito")
+    parser.add_argument("--probes", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="guarda los resultados en este archivo JSON")
+    parser.add_argument("--baseline", help="resultados JSON de otro commit para comparar")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.techs, args.pools, args.events, args.recurring, args.conflicts,
+                           args.probes, args.repeat, args.seed)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, old, current in regressions:
+            print(f"REGRESION {name}: p50 {old['p50_ms']:.3f} -> {current['p50_ms']:.3f}")
+        if regressions:
+            return 1
+        print(f"Sin regresiones respecto de {baseline.get('commit')} (umbral x{args.threshold}).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,11 +1,27 @@
 from models import Event, Resource
 from planner import Planner
-from storage import save_planner_state, load_planner_state
-from datetime import datetime
+from journal import PlannerJournal
+from storage import SAVE_DIR, planner_state, read_state_file
+from optimizer import load_backlog, optimize_backlog
+from batch import run_pipeline, CHUNK_SIZE
+from export import export_agenda
+from archive import ShardArchive, ACTIVE_HORIZON
+from datetime import datetime, timedelta
+import argparse
+import cProfile
 import os
+import pstats
+import sys
+import threading
+import time
 
 
 aplication_name = "Ctrl + Alt + Repair"
+STATS_FILE = os.path.join(SAVE_DIR, "stats.jsonl")
+#Eventos por pagina en list y res
+PAGE_SIZE = 20
+#Comandos que no usan el estado guardado: no esperan a que termine la carga en segundo plano
+STATELESS_COMMANDS = ("", "help", "jobs", "clean")
 
 def format_event(ev: Event, index: int = None) -> str:
     client = ev.event_metadata.get("client", "")
@@ -13,21 +29,30 @@ def format_event(ev: Event, index: int = None) -> str:
     notes = ev.event_metadata.get("notes", "")
     prefix = f"{index}. " if index is not None else ""
     return(
-        f"{prefix}{ev.event_title} | {ev.start_time} => {ev.end_time} | "
+        f"{prefix}[{ev.ref}] {ev.event_title} | {ev.start_time} => {ev.end_time} | "
         f"Recursos : {', '.join(ev.required_resources)}"
         + (f" | Cliente : {client}")
         + f" | Estado: {status}" 
         + (f" | Notes: {notes}" if notes else "")
     )
 
-def select_event_by_index(planner, prompt = "Índice del evento: "):
-    events = planner.list_scheduled_events()
+def select_event_by_index(planner, prompt = "Índice del evento: ", events = None):
+    #Los indices son los del ultimo listado mostrado (list, res o find); sin listado previo, los de todos los eventos.
+    #Tambien se puede elegir por id: 'id 12' (evento o serie) o 'id 12#3' (tercera ocurrencia de la serie 12)
+    if events is None:
+        events = planner.list_scheduled_events()
     if not events:
         print("No hay eventos programados actualmente")
         return None, events
     try:
-        idx = int(input(prompt).strip())
-        if 0 <= idx <= len(events):
+        answer = input(prompt).strip()
+        if answer.lower().startswith("id"):
+            ev = planner.get_event(answer[2:])
+            if ev is None:
+                print("No existe un evento con ese id.")
+            return ev, events
+        idx = int(answer)
+        if 0 <= idx < len(events):
             return events[idx], events
         else:
             print("Indice fuera de rango.")
@@ -36,6 +61,86 @@ def select_event_by_index(planner, prompt = "Índice del evento: "):
         print("Debes ingresar un número válido")
         return None, events
 
+def get_scope(ev):
+    #Alcance de un cambio sobre una ocurrencia de una serie (ver Planner.update_event); None si es invalido
+    if ev.series is None:
+        return "this"
+    answer = input("Alcance: (e)sta ocurrencia, esta y las (s)iguientes o toda la se(r)ie [e]: ").strip().lower()
+    return {"": "this", "e": "this", "s": "following", "r": "series"}.get(answer)
+
+def get_range():
+    #Devuelve (desde, hasta) como datetimes (None = sin limite), o None si el rango es invalido
+    text = input("Rango (vacio = todo, 'hoy', 'semana' o 'desde,hasta' con YYYY-MM-DD[THH:MM:SS], uno puede quedar vacio): ").strip().lower()
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    if not text:
+        return None, None
+    if text == "hoy":
+        return today, today + timedelta(days=1)
+    if text == "semana":
+        return today, today + timedelta(days=7)
+    parts = [x.strip() for x in text.split(",")]
+    if len(parts) > 2:
+        print("Rango invalido.")
+        return None
+    try:
+        start = datetime.fromisoformat(parts[0]) if parts[0] else None
+        end = None
+        if len(parts) == 2 and parts[1]:
+            end = datetime.fromisoformat(parts[1])
+            #Una fecha sin hora como 'hasta' incluye ese dia completo
+            if "t" not in parts[1]:
+                end += timedelta(days=1)
+    except ValueError:
+        print("Formato de fecha invalido. Usa YYYY-MM-DD o YYYY-MM-DDTHH:MM:SS")
+        return None
+    if start is not None and end is not None and end <= start:
+        print("El fin del rango debe ser despues del inicio.")
+        return None
+    return start, end
+
+def print_events(events):
+    #Muestra los eventos de a PAGE_SIZE; devuelve False si el usuario corto el listado
+    for i, ev in enumerate(events):
+        if i and i % PAGE_SIZE == 0:
+            more = input(f"-- {i} de {len(events)} -- Enter para ver mas, 'q' para terminar: ").strip().lower()
+            if more == "q":
+                return False
+        print(format_event(ev, i))
+    return True
+
+class StateLoader:
+    #Corre journal.load en un hilo. Mientras tanto nadie mas toca el planner: cada comando que lo usa llama
+    #antes a wait(), que espera a que termine (y relanza el error si la carga fallo)
+    def __init__(self, journal, planner):
+        self.journal = journal
+        self.planner = planner
+        self.result = None
+        self.elapsed = None
+        self._error = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._load, name="carga-estado", daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        started = time.perf_counter()
+        try:
+            self.result = self.journal.load(self.planner)
+        except BaseException as e:
+            self._error = e
+        self.elapsed = time.perf_counter() - started
+
+    def wait(self):
+        #True solo la primera vez, cuando la carga recien termina (para avisar una sola vez)
+        if self._thread is None:
+            return False
+        self._thread.join()
+        self._thread = None
+        if self._error is not None:
+            raise self._error
+        return True
+
 def get_date(prompt):
     while True:
         date_str = input(f"{prompt} (o escribe 'cancel' para cancelar): ").strip()
@@ -50,31 +155,101 @@ def get_date(prompt):
     
     
 
-def run_cli():
+def run_cli(started=None):
+    #started: time.perf_counter() al arrancar el proceso (main.py), para medir el tiempo hasta el prompt
     print(f"Bienvenido a {aplication_name} - Planificador de reparaciones de computadoras (CLI)")
     workshop_planner = Planner()
+    workshop_planner.stats.enabled = True
+    journal = PlannerJournal(archive=ShardArchive())
+    #'profile <comando>' corre ese comando bajo cProfile; el reporte se muestra antes del siguiente prompt
+    profiler = None
+    #Ultimo listado mostrado por list o res: remove y update eligen por sus indices
+    last_listing = None
     
-    try:
-        load_planner_state(workshop_planner, "data.json")
-        print("Estado cargado satisfactoriamente desde data.json")
-    except FileNotFoundError:
-        print("No existe data.json, iniciando estado vacio.")
+    #El estado se carga en segundo plano mientras se muestra el prompt; el primer comando que lo usa espera
+    loader = StateLoader(journal, workshop_planner)
+    loader.start()
+    if started is not None:
+        startup = time.perf_counter() - started
+        workshop_planner.stats.add_time("startup_prompt", startup)
+        print(f"Listo en {startup * 1000:.0f} ms (cargando data.json en segundo plano).")
         
     while True:
-        print("\nComandos: help, list, add, remove, jobs, res, slot, addres, addpool, rules, seed, save, load, clear, quit, clean")
+        if profiler is not None:
+            profiler.disable()
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+            profiler = None
+        print("\nComandos: help, list, find, add, edit, remove, jobs, res, slot, auto, plan, free, audit, export, report, archive, history, addres, addpool, rules, seed, save, compact, load, stats, clear, quit, clean")
         command = input("> ").strip().lower()
+        if command.startswith("profile "):
+            command = command[len("profile "):].strip()
+            profiler = cProfile.Profile()
+            profiler.enable()
+        if command not in STATELESS_COMMANDS and loader.wait():
+            has_snapshot, replayed = loader.result
+            if has_snapshot:
+                print(f"Estado cargado satisfactoriamente desde data.json ({len(workshop_planner.events_by_id)} eventos y series en {loader.elapsed * 1000:.0f} ms)")
+            else:
+                print("No existe data.json, iniciando estado vacio.")
+            if replayed:
+                print(f"Se reaplicaron {replayed} cambios del journal.")
         
         if command == "help":
-            print("Comandos disponibles en Ctrl + Alt + Repair:\n      list      =>  Lista todos  los eventos programados.\n      add      =>  Agrega un nuevo evento (con recurrencia opcional).\n      remove      => Elimina un evento por índice.\n      res      => Muestra la agenda de un recurso.\n      slot      => Busca el proximo hueco disponible para un evento.\n      addres      => Agrega un recurso con atributos.\n      addpool      => Configura un pool de recursos (tipo con cantidad).\n      rules      => Muestra las restricciones actuales.\n      seed       => Carga el dominio base del taller Ctrl + Alt + Repair.\n      save       => Guarda el estado en data.json.\n      load      => Carga el estado desde data.json\n      help       => Muestra esta ayuda\n      quit      => Sale de la aplicacion.\n      jobs      => Muestra un catalogo de los tipos de trabajos disponibles para realizar en el taller Ctrl + Alt + Repair.\n      clear      => Elimina toda la información (eventos, recursos, etc).\n      clean      => Limpia la consola.")
+            print("Comandos disponibles en Ctrl + Alt + Repair:\n      list      =>  Lista los eventos programados en un rango (todo, hoy, semana o desde,hasta), paginado.\n      add      =>  Agrega un nuevo evento (con recurrencia opcional).\n      find      =>  Busca eventos y series por titulo, cliente y/o estado.\n      edit      =>  Cambia titulo, horario, recursos o cliente de un evento (en una serie: esa ocurrencia, las siguientes o toda la serie).\n      remove      => Elimina un evento por su índice en el ultimo listado (list, res o find) o por id ('id 12', 'id 12#3').\n      res      => Muestra la agenda de un recurso en un rango, paginada.\n      slot      => Busca el proximo hueco disponible para un evento.\n      auto      => Asigna automaticamente tecnico, pool y dispositivos a un trabajo del catalogo en el primer horario posible.\n      plan      => Agenda un backlog de trabajos (archivo JSON) minimizando el tiempo total; muestra makespan y ocupacion.\n      free      => Quien esta libre en un horario (recursos, opcionalmente por skill, y unidades de cada pool) o ventanas en que varios recursos estan libres a la vez.\n      audit      => Revisa todo el estado (o un archivo como data.json) buscando choques, pools excedidos, restricciones y requisitos del catalogo.\n      export      => Exporta la agenda de un recurso o de todo el taller a iCalendar (.ics) o CSV; las series salen como reglas de repeticion.\n      report      => Uso de recursos y pools en un rango: ocupacion por dia o semana, concurrencia pico e histograma de huecos (requiere numpy).\n      archive      => Pasa al archivo historico (un archivo comprimido por mes) los eventos terminados hace mas de N dias; tambien se hace solo al compactar.\n      history      => Lista eventos archivados en un rango (de todo el taller o de un recurso), leyendo solo los meses de ese rango.\n      addres      => Agrega un recurso con atributos.\n      addpool      => Configura un pool de recursos (tipo con cantidad).\n      rules      => Muestra las restricciones actuales.\n      seed       => Carga el dominio base del taller Ctrl + Alt + Repair.\n      save       => Guarda el estado (journal de cambios, compactado en data.json cuando crece).\n      compact       => Compacta el journal en data.json.\n      load      => Carga el estado desde data.json\n      stats      => Muestra y reinicia las mediciones (validaciones, conflictos por tipo, busquedas de huecos, guardar/cargar); 'json' las agrega a save/stats.jsonl.\n      profile <comando>      => Corre cualquier comando bajo cProfile y muestra las funciones mas costosas.\n      help       => Muestra esta ayuda\n      quit      => Sale de la aplicacion.\n      jobs      => Muestra un catalogo de los tipos de trabajos disponibles para realizar en el taller Ctrl + Alt + Repair.\n      clear      => Elimina toda la información (eventos, recursos, etc).\n      clean      => Limpia la consola.")
         
         elif command == "list":
-            events = workshop_planner.list_scheduled_events()
+            window = get_range()
+            if window is None:
+                continue
+            events = workshop_planner.events_between(*window)
+            last_listing = events
             if not events:
                 print("Sin eventos")
             else:
-                for i, ev in enumerate(events):
-                    print(format_event(ev, i))
+                print_events(events)
         
+        elif command == "find":
+            title = input("Titulo (vacio = cualquiera): ").strip() or None
+            client = input("Cliente (vacio = cualquiera): ").strip() or None
+            status = input("Estado (vacio = cualquiera): ").strip().lower() or None
+            events = workshop_planner.find_events(title, client, status)
+            last_listing = events
+            if not events:
+                print("Sin eventos")
+            else:
+                print_events(events)
+
+        elif command == "edit":
+            ev, events = select_event_by_index(workshop_planner, "Indice del evento a editar: ", last_listing)
+            if ev:
+                scope = get_scope(ev)
+                if scope is None:
+                    print("Alcance invalido.")
+                    continue
+                try:
+                    changes = {}
+                    title = input("Nuevo titulo (vacio = sin cambios): ").strip()
+                    if title:
+                        changes["title"] = title
+                    start = input(f"Nuevo inicio (YYYY-MM-DDTHH:MM:SS, vacio = {ev.start_time.isoformat()}): ").strip()
+                    if start:
+                        changes["start"] = datetime.fromisoformat(start)
+                    end = input(f"Nuevo fin (YYYY-MM-DDTHH:MM:SS, vacio = {ev.end_time.isoformat()}): ").strip()
+                    if end:
+                        changes["end"] = datetime.fromisoformat(end)
+                    resources = [x.strip() for x in input("Recursos (separados por coma, vacio = sin cambios): ").split(",") if x.strip()]
+                    if resources:
+                        changes["resources"] = resources
+                    client = input("Cliente (vacio = sin cambios): ").strip()
+                    if client:
+                        changes["metadata"] = {"client": client}
+                except ValueError:
+                    print("Formato de fecha invalido. Usa YYYY-MM-DDTHH:MM:SS")
+                    continue
+                ok, msg = workshop_planner.update_event(ev, changes, scope)
+                print("Evento actualizado correctamente." if ok else msg)
+                last_listing = None
+
         elif command == "add":
             try:
                 title = input("Titulo: ").strip()
@@ -87,9 +262,16 @@ def run_cli():
                 rec_freq = input("Recurrencia (none/daily/weekly/monthly): ").strip().lower()
                 recurrence = None
                 if rec_freq in ("daily", "weekly", "monthly"):
-                    rec_count_in = input("Repeticiones (entero, por defecto 1): ").strip()
-                    rec_count = int(rec_count_in) if rec_count_in else 1
-                    recurrence = {"freq": rec_freq, "count": rec_count}
+                    rec_count_in = input("Repeticiones (entero, por defecto 1, 'inf' = sin fin): ").strip().lower()
+                    if rec_count_in == "inf":
+                        recurrence = {"freq": rec_freq}
+                        rec_until = input("Hasta (YYYY-MM-DDTHH:MM:SS, opcional): ").strip()
+                        if rec_until:
+                            datetime.fromisoformat(rec_until)
+                            recurrence["until"] = rec_until
+                    else:
+                        rec_count = int(rec_count_in) if rec_count_in else 1
+                        recurrence = {"freq": rec_freq, "count": rec_count}
                 
                 new_event = Event(title, start, end, resources, {"client": client}, recurrence)
                 ok, msg = workshop_planner.schedule_event(new_event)
@@ -98,9 +280,14 @@ def run_cli():
                 print(f"Error: {e}")
                 
         elif command == "remove":
-            ev, events = select_event_by_index(workshop_planner, "Indice del evento a eliminar: ")
+            ev, events = select_event_by_index(workshop_planner, "Indice del evento a eliminar: ", last_listing)
             if ev:
-                workshop_planner.scheduled_events.remove(ev)
+                scope = get_scope(ev)
+                if scope is None:
+                    print("Alcance invalido.")
+                    continue
+                workshop_planner.remove_event(ev, scope)
+                last_listing = None
                 print(f"Evento '{ev.event_title}' eliminado correctamente.")
         
         elif command == "jobs":
@@ -110,12 +297,15 @@ def run_cli():
             
         elif command == "res":
             name = input("Recurso: ").strip()
-            sched = workshop_planner.get_schedule_for_resource(name)
+            window = get_range()
+            if window is None:
+                continue
+            sched = workshop_planner.agenda(name, *window)
+            last_listing = sched
             if not sched:
-                print("Sin agenda para ese recurso, o inexistente.")
+                print("Sin agenda para ese recurso en ese rango, o inexistente.")
             else:
-                for i, ev in enumerate(sched):
-                    print(format_event(ev, i))
+                print_events(sched)
         
         elif command == "slot":
             try:
@@ -126,14 +316,110 @@ def run_cli():
                     continue
                 from_str = input("Buscar desde (YYYY-MM-DDTHH:MM:SS) ").strip()
                 from_dt = datetime.fromisoformat(from_str)
-                slot_start, slot_end = workshop_planner.find_next_available_slot(ev, from_dt)
-                if slot_start and slot_end:
-                    print(f"Hueco: {slot_start} => {slot_end}")
+                until_str = input("Buscar hasta (YYYY-MM-DDTHH:MM:SS, opcional) ").strip()
+                until_dt = datetime.fromisoformat(until_str) if until_str else None
+                limit_in = input("Cantidad de huecos (entero, por defecto 1, 'all' para todos en el rango): ").strip().lower()
+                if limit_in == "all":
+                    limit = None
+                else:
+                    limit = int(limit_in) if limit_in else 1
+                slots = workshop_planner.find_available_slots(ev, from_dt, limit, until_dt)
+                if slots:
+                    for slot_start, slot_end in slots:
+                        print(f"Hueco: {slot_start} => {slot_end}")
                 else:
                     print("No se encontro hueco en el rango")
             except Exception as e:
                 print(f"Error: {e}")
                 
+        elif command == "auto":
+            try:
+                title = input("Trabajo del catalogo: ").strip()
+                client = input("Cliente: ").strip()
+                minutes = int(input("Duracion (minutos): ").strip())
+                from_dt = datetime.fromisoformat(input("Buscar desde (YYYY-MM-DDTHH:MM:SS) ").strip())
+                until_str = input("Buscar hasta (YYYY-MM-DDTHH:MM:SS, opcional) ").strip()
+                until_dt = datetime.fromisoformat(until_str) if until_str else None
+                ev, msg = workshop_planner.auto_assign(title, timedelta(minutes=minutes), from_dt, until_dt, {"client": client})
+                if ev is None:
+                    print(msg)
+                    continue
+                print(f"Asignacion propuesta: {format_event(ev)}")
+                if input("¿Agendar? (y/n): ").strip().lower() == "y":
+                    ok, msg = workshop_planner.schedule_event(ev)
+                    print(msg)
+            except Exception as e:
+                print(f"Error: {e}")
+                
+        elif command == "plan":
+            try:
+                filename = input("Archivo del backlog (JSON): ").strip()
+                jobs = load_backlog(filename)
+                from_dt = datetime.fromisoformat(input("Agendar desde (YYYY-MM-DDTHH:MM:SS) ").strip())
+                budget_in = input("Tiempo de optimizacion en segundos (por defecto 2): ").strip()
+                result = optimize_backlog(workshop_planner, jobs, from_dt, float(budget_in) if budget_in else 2.0, commit=False)
+                for i, ev in enumerate(result["events"]):
+                    print(format_event(ev, i))
+                for job, msg in result["unscheduled"]:
+                    print(f"Sin agendar: {job.title} ({msg})")
+                for job, ev in result["late"]:
+                    print(f"Atrasado: {ev.event_title} termina {ev.end_time}, limite {job.deadline}")
+                print(f"Makespan: {result['makespan']} | Iteraciones: {result['iterations']} | Tiempo: {result['elapsed']:.2f}s")
+                for name, fraction in sorted(result["utilization"].items()):
+                    print(f"  - {name}: {fraction:.0%} ocupado")
+                if result["events"] and input("¿Agendar este plan? (y/n): ").strip().lower() == "y":
+                    ok, report = workshop_planner.schedule_many(result["events"])
+                    print(f"{len(result['events'])} trabajos agendados." if ok else "El plan ya no es valido, no se agendo nada.")
+            except Exception as e:
+                print(f"Error: {e}")
+                
+        elif command == "free":
+            mode = input("(r)ecursos libres en un horario o (v)entanas comunes de varios recursos [r]: ").strip().lower() or "r"
+            if mode == "r":
+                start_str = get_date("Desde (YYYY-MM-DDTHH:MM:SS)")
+                if start_str is None:
+                    continue
+                end_str = get_date("Hasta (YYYY-MM-DDTHH:MM:SS)")
+                if end_str is None:
+                    continue
+                start, end = datetime.fromisoformat(start_str), datetime.fromisoformat(end_str)
+                if end <= start:
+                    print("El tiempo de finalizacion debe ser despues del de inicio")
+                    continue
+                skill = input("Skill (vacio = todos los recursos): ").strip() or None
+                free, pools = workshop_planner.free_resources(start, end, skill)
+                print("Recursos libres: " + (", ".join(free) if free else "ninguno"))
+                for pool, units in pools.items():
+                    print(f"  {pool}: {units} de {workshop_planner.resource_pools[pool]} unidades libres")
+            elif mode == "v":
+                names = [x.strip() for x in input("Recursos (separados por coma): ").split(",") if x.strip()]
+                if not names:
+                    continue
+                invalid = [n for n in names if n not in workshop_planner.available_resources or n in workshop_planner.resource_pools]
+                if invalid:
+                    print(f"Recursos inexistentes o pools (las ventanas comunes son solo para recursos): {', '.join(invalid)}")
+                    continue
+                window = get_range()
+                if window is None:
+                    continue
+                start, end = window
+                start = start or datetime.now().replace(second=0, microsecond=0)
+                end = end or start + timedelta(days=7)
+                try:
+                    minutes = int(input("Duracion minima en minutos [60]: ").strip() or 60)
+                except ValueError:
+                    print("Duracion invalida.")
+                    continue
+                windows = workshop_planner.common_free_windows(names, start, end, timedelta(minutes=minutes))
+                if not windows:
+                    print("No hay ventanas comunes en ese rango.")
+                for window_start, window_end in windows[:PAGE_SIZE]:
+                    print(f"  {window_start.isoformat()} => {window_end.isoformat()}")
+                if len(windows) > PAGE_SIZE:
+                    print(f"  ... y {len(windows) - PAGE_SIZE} mas")
+            else:
+                print("Opcion invalida.")
+
         elif command == "addres":
             name = input("Nombre del recurso: ").strip()
             typ = input("Tipo (tech, station, tool, device) ").strip()
@@ -194,32 +480,144 @@ def run_cli():
                 requirements = ", ".join(parts)
                 print(f"  - {job} siempre requiere {requirements}")
         
+        elif command == "stats":
+            action = input("Accion (enter = mostrar y reiniciar, json = agregar a save/stats.jsonl, on/off = activar/desactivar): ").strip().lower()
+            if action == "on" or action == "off":
+                workshop_planner.stats.enabled = action == "on"
+                print(f"Mediciones {'activadas' if workshop_planner.stats.enabled else 'desactivadas'}.")
+            elif action == "json":
+                workshop_planner.stats.dump(STATS_FILE)
+                workshop_planner.stats.reset()
+                print(f"Mediciones agregadas a {STATS_FILE}")
+            else:
+                for line in workshop_planner.stats.report_lines():
+                    print(line)
+                cache = workshop_planner.validation_cache
+                if cache is not None:
+                    info = cache.info()
+                    print(f"  cache de validaciones: {info['hits']} aciertos, {info['misses']} fallos ({info['stale']} vencidas), "
+                          f"{info['hit_rate']:.0%} aciertos, {info['evictions']} desalojos, {info['size']}/{info['capacity']} entradas")
+                    cache.reset_counters()
+                workshop_planner.stats.reset()
+        
         elif command == "seed":
             seed_domain(workshop_planner)
             print("Dominio base de Ctrl + Alt + Repair cargado.")
         
         elif command == "save":
-            save_planner_state(workshop_planner)
-            print("Guardado en data.json")
+            #Cada cambio ya esta en el journal; solo se compacta en data.json cuando el journal crece
+            if journal.checkpoint():
+                print("Guardado en data.json")
+            else:
+                print(f"Guardado en el journal ({journal.pending} cambios desde la ultima compactacion).")
         
-        elif command == "load":
+        elif command == "compact":
+            journal.compact()
+            print("Guardado en data.json (journal compactado)")
+        
+        elif command == "audit":
+            from audit import audit_state, report_lines, write_report
+            filename = input("Archivo a auditar (vacio = estado actual): ").strip()
             try:
-                load_planner_state(workshop_planner)
-                print("Cargado data.json")
-            except FileNotFoundError:
+                data = read_state_file(filename) if filename else planner_state(workshop_planner)
+            except (OSError, ValueError) as e:
+                print(f"No se pudo leer el archivo: {e}")
+                continue
+            report = audit_state(data, job_catalog=workshop_planner.job_catalog)
+            for line in report_lines(report):
+                print(line)
+            out = input("Guardar el reporte JSON en (vacio = no guardar): ").strip()
+            if out:
+                write_report(report, out)
+                print(f"Reporte guardado en {out}")
+
+        elif command == "export":
+            name = input("Recurso (vacio = todo el taller): ").strip() or None
+            if name is not None and name not in workshop_planner.available_resources and name not in workshop_planner.resource_pools:
+                print("Recurso inexistente.")
+                continue
+            window = get_range()
+            if window is None:
+                continue
+            fmt = input("Formato (ics/csv) [ics]: ").strip().lower() or "ics"
+            if fmt not in ("ics", "csv"):
+                print("Formato invalido.")
+                continue
+            filename = input("Archivo de salida (vacio = pantalla): ").strip()
+            try:
+                if filename:
+                    with open(filename, "w", encoding="utf-8", newline="") as f:
+                        export_agenda(workshop_planner, fmt, f, name, *window)
+                    print(f"Agenda exportada en {filename}")
+                else:
+                    export_agenda(workshop_planner, fmt, sys.stdout, name, *window)
+            except OSError as e:
+                print(f"No se pudo escribir el archivo: {e}")
+
+        elif command == "report":
+            #NumPy tarda en importarse: solo se carga si se pide un reporte
+            import analytics
+            if not analytics.AVAILABLE:
+                print("El reporte de uso necesita numpy (pip install numpy).")
+                continue
+            window = get_range()
+            if window is None:
+                continue
+            period = {"": "day", "d": "day", "dia": "day", "s": "week", "semana": "week"}.get(input("Por (d)ia o (s)emana [d]: ").strip().lower())
+            if period is None:
+                print("Periodo invalido.")
+                continue
+            name = input("Recurso o pool (vacio = todos): ").strip()
+            if name and name not in workshop_planner.available_resources and name not in workshop_planner.resource_pools:
+                print("Recurso inexistente.")
+                continue
+            report = analytics.usage_report(workshop_planner, *window, period=period, names=[name] if name else None)
+            for line in analytics.report_lines(report):
+                print(line)
+
+        elif command == "archive":
+            days = input(f"Archivar eventos terminados hace mas de cuantos dias [{ACTIVE_HORIZON.days}]: ").strip()
+            try:
+                days = int(days) if days else ACTIVE_HORIZON.days
+            except ValueError:
+                print("Debes ingresar un número válido")
+                continue
+            moved, months = journal.archive.archive_before(workshop_planner, datetime.now() - timedelta(days=days))
+            if moved:
+                journal.compact()
+                last_listing = None
+            print(f"{moved} eventos archivados en {months} meses de {journal.archive.directory}")
+
+        elif command == "history":
+            window = get_range()
+            if window is None:
+                continue
+            name = input("Recurso (vacio = todo el taller): ").strip() or None
+            events = journal.archive.events_between(*window, resource_name=name)
+            if not events:
+                print("Sin eventos archivados en ese rango.")
+            else:
+                #Solo lectura: los indices de este listado no sirven para remove o update
+                print_events(events)
+
+        elif command == "load":
+            has_snapshot, replayed = journal.load(workshop_planner)
+            last_listing = None
+            if has_snapshot:
+                print("Cargado data.json" + (f" + {replayed} cambios del journal" if replayed else ""))
+            else:
                 print("No existe data.json")
         
         elif command == "clear":
             confirm = input("¿Seguro que quieres eliminar toda la información? (y/n): ")
             if confirm.lower() == "y":
-                workshop_planner.scheduled_events = []
-                workshop_planner.available_resources = {}
-                workshop_planner.resource_restrictions = {"corequisite": [], "exclusion": []}
-                workshop_planner.resource_pools = {}
-                workshop_planner.job_catalog = []
+                workshop_planner.clear()
+                last_listing = None
             print("Toda la información fue borrada, recuerda que siempre puedes cargar una plantilla predefinida usando el comando 'seed'.")
         
         elif command == "quit":
+            journal.checkpoint()
+            journal.detach()
             print(f"Gracias por usar {aplication_name}")
             break
         
@@ -227,12 +625,12 @@ def run_cli():
             os.system("cls" if os.name == "nt" else "clear" )
             
         elif command == "update":
-            ev, events = select_event_by_index(workshop_planner, "Indice del evento a actualizar: ")
+            ev, events = select_event_by_index(workshop_planner, "Indice del evento a actualizar: ", last_listing)
             if ev:
                 print(f"Evento seleccionado: '{ev.event_title}'")
                 new_status = input("Nuevo estado (pendiente/en progreso/completado) ").strip().lower()
                 if workshop_planner.validate_status(new_status):
-                    ev.event_metadata["status"] = new_status
+                    workshop_planner.update_event_status(ev, new_status)
                     print(f"Estado del evento '{ev.event_title}' actualizado a '{new_status}'")
                 else:
                     print("Estado inválido.")
@@ -240,6 +638,41 @@ def run_cli():
             print("Comando no reconocido.")
         
 
+
+def run_batch(argv=None):
+    #Modo no interactivo: python main.py --batch trabajos.csv [--output resultados.jsonl] [--dry-run].
+    #'-' como entrada lee de stdin; el formato sale de la extension o de --format
+    parser = argparse.ArgumentParser(description=f"{aplication_name} - carga de trabajos por lotes (CSV o JSONL)")
+    parser.add_argument("--batch", required=True, metavar="ARCHIVO", help="archivo CSV/JSONL con los trabajos, o '-' para stdin")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="por defecto segun la extension (stdin: jsonl)")
+    parser.add_argument("--output", default="-", help="resultados JSONL (por defecto stdout)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="filas que se validan juntas")
+    parser.add_argument("--dry-run", action="store_true", help="valida contra el estado guardado sin guardar nada")
+    args = parser.parse_args(argv)
+    fmt = args.format or ("csv" if args.batch.lower().endswith(".csv") else "jsonl")
+
+    workshop_planner = Planner()
+    journal = PlannerJournal(archive=ShardArchive())
+    journal.load(workshop_planner)
+    if args.dry_run:
+        journal.detach()
+    started = time.perf_counter()
+    source = sys.stdin if args.batch == "-" else open(args.batch, "r", encoding="utf-8", newline="")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        rows, scheduled = run_pipeline(workshop_planner, source, out, fmt, args.chunk)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+        if not args.dry_run:
+            journal.checkpoint()
+            journal.detach()
+    print(f"{rows} filas: {scheduled} agendadas, {rows - scheduled} rechazadas ({time.perf_counter() - started:.2f} s)"
+          + (" [dry-run, sin guardar]" if args.dry_run else ""), file=sys.stderr)
+    return 0 if scheduled == rows else 1
+
                             
 def seed_domain(workshop_planner: Planner):
     #Plantilla por defecto creada para usar la app Ctrl + Alt + Repair
@@ -0,0 +1,122 @@
+import threading
+from models import to_epoch_seconds
+
+#Planner compartido entre hilos (por ejemplo, los del servidor de server.py). Las reservas usan commits
+#optimistas versionados: cada recurso tiene una version que sube con cada commit que lo toca; la reserva se
+#valida sin lock anotando las versiones de los recursos que lee, y bajo un lock corto se agrega si ninguna
+#cambio (si cambio alguna, se vuelve a validar ahi mismo). Asi la validacion, que es lo caro, corre en
+#paralelo para reservas de recursos distintos. Las lecturas no toman el lock: usan el contador global como
+#seqlock (impar mientras hay un commit en curso) y reintentan si un commit se les cruzo
+
+#Lecturas optimistas que se intentan antes de leer con el lock tomado. Regla de las lecturas sin lock: una
+#consulta que se cruza con un commit puede ver el planner a medio cambiar y fallar con cualquier excepcion
+#(RuntimeError por un dict que cambio de tamanio, IndexError, KeyError de un indice a medio escribir...).
+#read la reintenta solo si la version cambio mientras corria; si no cambio, el error es genuino y se propaga.
+#Vale porque todo cambio del planner pasa por este objeto y sube la version antes de tocarlo; por eso las
+#consultas no deben escribir el planner (salvo caches que se validen solas, como scheduled_events)
+READ_RETRIES = 3
+
+
+class SharedPlanner:
+    def __init__(self, planner):
+        self.planner = planner
+        #Sube dos veces por commit: antes y despues de tocar el planner
+        self.version = 0
+        #Id de recurso -> version del ultimo commit que lo toco, y version del ultimo cambio general (write)
+        self.resource_versions = {}
+        self.general_version = 0
+        self._lock = threading.Lock()
+        #Los pools cargados en bloque insertan sus reservas en el arbol en la primera consulta; se fuerza
+        #ahora para que ninguna lectura escriba el arbol en paralelo con un commit
+        for occupancy in planner.pool_occupancy.values():
+            occupancy.max_in_use(0, 1)
+
+    def schedule_event(self, event):
+        #Como Planner.schedule_event. Devuelve (ok, mensaje)
+        planner = self.planner
+        reads = set(event.resource_ids) | set(planner._pool_units_needed(event))
+        seen = self._versions(reads)
+        try:
+            ok, msg = planner._admit(event)
+        except Exception:
+            #Un commit cambio el planner mientras se recorria (ver READ_RETRIES): se valida de nuevo bajo el
+            #lock, donde un error genuino se vuelve a lanzar
+            seen = None
+        with self._lock:
+            if seen is None or self._versions(reads) != seen:
+                planner.stats.count("optimistic_retries")
+                ok, msg = planner._admit(event)
+            if not ok:
+                return False, msg
+            self._begin()
+            try:
+                msg = planner._commit(event)
+            finally:
+                #Tambien los pools que el trabajo ocupa por el catalogo sin listarlos
+                self._end(planner._indexed_rids(event))
+        return True, msg
+
+    def write(self, action, *args, **kwargs):
+        #Cualquier otro cambio (quitar, editar, cambiar estado, recursos...) se aplica con el lock tomado y
+        #cuenta como cambio de todos los recursos: las reservas que se estaban validando se revalidan
+        with self._lock:
+            self._begin()
+            try:
+                return action(*args, **kwargs)
+            finally:
+                self._end(None)
+
+    def exclusive(self, action, *args, **kwargs):
+        #Con el lock tomado pero sin subir versiones, para lo que no cambia el planner (el fsync del journal):
+        #las reservas que se estan validando no tienen por que reintentar
+        with self._lock:
+            return action(*args, **kwargs)
+
+    def read(self, query, *args, **kwargs):
+        #query debe devolver un resultado ya armado (listas, no generadores)
+        for attempt in range(READ_RETRIES):
+            before = self.version
+            if before % 2:
+                continue
+            try:
+                result = query(*args, **kwargs)
+            except Exception:
+                if self.version == before:
+                    raise
+                continue
+            if self.version == before:
+                return result
+        self.planner.stats.count("locked_reads")
+        with self._lock:
+            return query(*args, **kwargs)
+
+    def free_resources(self, start_time, end_time, skill=None):
+        self._prepare_availability(start_time, end_time)
+        return self.read(self.planner.free_resources, start_time, end_time, skill)
+
+    def common_free_windows(self, resource_names, start_time, end_time, min_duration):
+        self._prepare_availability(start_time, end_time)
+        return self.read(self.planner.common_free_windows, resource_names, start_time, end_time, min_duration)
+
+    def _prepare_availability(self, start_time, end_time):
+        #La matriz de disponibilidad se arma con la primera consulta; armarla es una escritura, va con el lock
+        start_key, end_key = to_epoch_seconds(start_time), to_epoch_seconds(end_time)
+        matrix = self.planner._availability
+        if matrix is None or not matrix.covers(start_key, end_key):
+            with self._lock:
+                self.planner._availability_for(start_key, end_key)
+
+    def _versions(self, rids):
+        return self.general_version, tuple(self.resource_versions.get(rid, 0) for rid in sorted(rids))
+
+    def _begin(self):
+        self.version += 1
+
+    def _end(self, rids):
+        self.version += 1
+        if rids is None:
+            #Cambio general: se invalidan todas las validaciones en curso
+            self.general_version = self.version
+        else:
+            for rid in rids:
+                self.resource_versions[rid] = self.version
@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from models import resource_id
+
+#Validaciones que recuerda el ValidationCache de cada planner
+VALIDATION_CACHE_SIZE = 4096
+
+
+class CompiledConstraints:
+    #Recursos, restricciones y catalogo compilados a tablas por id de recurso (mascaras de bits).
+    #El planner los compila una vez y los descarta cuando cambian recursos, pools o restricciones;
+    #asi cada validacion revisa las reglas con operaciones de bits por recurso del evento
+    def __init__(self, available_resources, resource_pools, restrictions):
+        self.known_mask = 0
+        self.pool_mask = 0
+        for name in available_resources:
+            self.known_mask |= 1 << resource_id(name)
+        for name in resource_pools:
+            bit = 1 << resource_id(name)
+            self.known_mask |= bit
+            self.pool_mask |= bit
+
+        #Correquisitos: id -> mascara de los recursos que exige. Exclusiones: id -> mascara de los que prohibe.
+        #Las listas (bit_a, bit_b, a, b) conservan el orden original para reportar la primera regla violada
+        self.requires = {}
+        self.excludes = {}
+        self.corequisites = []
+        self.exclusions = []
+        for a, b in restrictions.get("corequisite", []):
+            bit_a, bit_b = 1 << resource_id(a), 1 << resource_id(b)
+            self.requires[resource_id(a)] = self.requires.get(resource_id(a), 0) | bit_b
+            self.corequisites.append((bit_a, bit_b, a, b))
+        for a, b in restrictions.get("exclusion", []):
+            bit_a, bit_b = 1 << resource_id(a), 1 << resource_id(b)
+            self.excludes[resource_id(a)] = self.excludes.get(resource_id(a), 0) | bit_b
+            self.exclusions.append((bit_a, bit_b, a, b))
+
+        #Skill -> mascara de los recursos que la tienen
+        self.skill_masks = {}
+        for res in available_resources.values():
+            for skill in (res.resource_attributes or {}).get("skills", []):
+                self.skill_masks[skill] = self.skill_masks.get(skill, 0) | 1 << res.resource_id
+
+        #Titulo -> (requisitos del catalogo, CompiledJob); se compila la primera vez que se valida ese trabajo
+        self._jobs = {}
+
+    def first_unknown(self, event):
+        #Id del primer recurso del evento que no esta registrado, o None
+        if not event.resource_mask & ~self.known_mask:
+            return None
+        for rid in event.resource_ids:
+            if not self.known_mask >> rid & 1:
+                return rid
+        return None
+
+    def corequisite_violation(self, event):
+        mask = event.resource_mask
+        required = 0
+        for rid in event.resource_ids:
+            required |= self.requires.get(rid, 0)
+        if not required & ~mask:
+            return None
+        for bit_a, bit_b, a, b in self.corequisites:
+            if mask & bit_a and not mask & bit_b:
+                return a, b
+        return None
+
+    def exclusion_violation(self, event):
+        mask = event.resource_mask
+        excluded = 0
+        for rid in event.resource_ids:
+            excluded |= self.excludes.get(rid, 0)
+        if not excluded & mask:
+            return None
+        for bit_a, bit_b, a, b in self.exclusions:
+            if mask & bit_a and mask & bit_b:
+                return a, b
+        return None
+
+    def job(self, title, requirements):
+        #Si el catalogo cambio el dict de requisitos de ese titulo, se vuelve a compilar
+        cached = self._jobs.get(title)
+        if cached is None or cached[0] is not requirements:
+            cached = self._jobs[title] = (requirements, CompiledJob(requirements, self.skill_masks))
+        return cached[1]
+
+
+class CompiledJob:
+    #Requisitos de un trabajo del catalogo: (skill, mascara de quienes la tienen), (pool, id, cantidad)
+    #y los dispositivos, tambien como mascara
+    def __init__(self, requirements, skill_masks):
+        self.skills = [(skill, skill_masks.get(skill, 0)) for skill in requirements.get("skills", [])]
+        self.pools = [(pool, resource_id(pool), qty) for pool, qty in requirements.get("pools", {}).items()]
+        self.devices = [(device, 1 << resource_id(device)) for device in requirements.get("devices", [])]
+        self.device_mask = 0
+        for device, bit in self.devices:
+            self.device_mask |= bit
+
+    def missing_skill(self, event):
+        for skill, mask in self.skills:
+            if not event.resource_mask & mask:
+                return skill
+        return None
+
+    def missing_device(self, event):
+        if not self.device_mask & ~event.resource_mask:
+            return None
+        for device, bit in self.devices:
+            if not event.resource_mask & bit:
+                return device
+        return None
+
+
+class ValidationCache:
+    #Resultados de validar un evento (positivos y negativos) por (recursos, inicio, fin, titulo), con desalojo
+    #LRU. Cada entrada recuerda con que reglas compiladas y que requisitos del catalogo se calculo, los recursos
+    #que leyo (los del evento y los pools del catalogo) y el sello de cambios del planner al empezar: deja de
+    #valer si cambian las reglas o esa entrada del catalogo, o si algun evento toco despues uno de esos recursos
+    def __init__(self, capacity=VALIDATION_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, key, rules, requirements, stamps):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        result, entry_rules, entry_requirements, seen, rids = entry
+        if entry_rules is not rules or entry_requirements is not requirements or any(stamps.get(rid, 0) > seen for rid in rids):
+            self.stale += 1
+            self.misses += 1
+            self.entries.pop(key, None)
+            return None
+        self.hits += 1
+        try:
+            self.entries.move_to_end(key)
+        except KeyError:
+            #Otro hilo la desalojo mientras tanto (validaciones optimistas de concurrency.SharedPlanner)
+            pass
+        return result
+
+    def put(self, key, result, rules, requirements, seen, rids):
+        self.entries[key] = (result, rules, requirements, seen, rids)
+        while len(self.entries) > self.capacity:
+            try:
+                self.entries.popitem(last=False)
+            except KeyError:
+                break
+            self.evictions += 1
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def info(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "stale": self.stale, "evictions": self.evictions,
+                "size": len(self.entries), "capacity": self.capacity, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def reset_counters(self):
+        self.hits = self.misses = self.stale = self.evictions = 0
@@ -0,0 +1,153 @@
+import argparse
+import csv
+import sys
+from datetime import datetime, timezone
+from planner import Planner
+from journal import PlannerJournal
+from models import from_epoch_seconds
+
+#Exportacion de agendas (de un recurso o de todo el taller) a iCalendar (.ics) o CSV. Todo sale de generadores
+#sobre Planner.iter_bookings y se escribe por bloques, asi exportar un anio completo no arma el documento en
+#memoria. Las series van como una sola entrada con su regla (RRULE; en CSV, en la columna rrule) y sus ocurrencias
+#canceladas (EXDATE; en CSV, en la columna exdates).
+#Uso: python export.py ics|csv [--resource NOMBRE] [--from FECHA] [--to FECHA] [--output archivo]
+
+#Lineas que se juntan antes de cada escritura
+EXPORT_CHUNK = 500
+CSV_HEADER = ["id", "title", "start", "end", "resources", "client", "status", "notes", "rrule", "exdates"]
+#En el planner 'monthly' es cada 30 dias, no el mismo dia de cada mes
+RRULE_FREQUENCIES = {"daily": "FREQ=DAILY", "weekly": "FREQ=WEEKLY", "monthly": "FREQ=DAILY;INTERVAL=30"}
+
+
+def rrule(event):
+    #Regla iCalendar de la serie, o None si el evento es suelto
+    rule = event.recurrence_rule()
+    if rule is None:
+        return None
+    text = RRULE_FREQUENCIES[rule.frequency]
+    if rule.count is not None:
+        text += f";COUNT={rule.count}"
+    return text
+
+
+def exdates(event):
+    #Inicios de las ocurrencias canceladas de la serie, en orden (vacio si el evento es suelto)
+    rule = event.recurrence_rule()
+    if rule is None:
+        return []
+    return [from_epoch_seconds(rule.occurrence_start(index)) for index in sorted(rule.cancelled)]
+
+
+def ical_lines(planner, resource_name=None, start_time=None, end_time=None):
+    stamp = _ical_time(datetime.now(timezone.utc)) + "Z"
+    yield "BEGIN:VCALENDAR"
+    yield "VERSION:2.0"
+    yield "PRODID:-//Ctrl + Alt + Repair//Planificador//ES"
+    yield "CALSCALE:GREGORIAN"
+    name = resource_name or "Ctrl + Alt + Repair"
+    yield _fold(f"X-WR-CALNAME:{_escape(name)}")
+    for ev in planner.iter_bookings(resource_name, start_time, end_time):
+        yield "BEGIN:VEVENT"
+        yield _fold(f"UID:{ev.ref}@ctrl-alt-repair")
+        yield f"DTSTAMP:{stamp}"
+        yield f"DTSTART:{_ical_time(ev.start_time)}"
+        yield f"DTEND:{_ical_time(ev.end_time)}"
+        rule = rrule(ev)
+        if rule is not None:
+            yield f"RRULE:{rule}"
+            cancelled = exdates(ev)
+            if cancelled:
+                yield _fold("EXDATE:" + ",".join(_ical_time(moment) for moment in cancelled))
+        yield _fold(f"SUMMARY:{_escape(ev.event_title)}")
+        yield _fold("RESOURCES:" + ",".join(_escape(name) for name in ev.required_resources))
+        details = [f"{label}: {ev.event_metadata[key]}" for key, label in (("client", "Cliente"), ("status", "Estado"), ("notes", "Notas"))
+                   if ev.event_metadata.get(key)]
+        if details:
+            yield _fold("DESCRIPTION:" + _escape("\n".join(details)))
+        yield "END:VEVENT"
+    yield "END:VCALENDAR"
+
+
+def csv_rows(planner, resource_name=None, start_time=None, end_time=None):
+    yield CSV_HEADER
+    for ev in planner.iter_bookings(resource_name, start_time, end_time):
+        yield [
+            ev.ref, ev.event_title, ev.start_time.isoformat(), ev.end_time.isoformat(), ";".join(ev.required_resources),
+            ev.event_metadata.get("client", ""), ev.event_metadata.get("status", "pendiente"), ev.event_metadata.get("notes", ""),
+            rrule(ev) or "", ";".join(moment.isoformat() for moment in exdates(ev)),
+        ]
+
+
+def write_ical(lines, out, chunk=EXPORT_CHUNK):
+    #iCalendar usa CRLF al final de cada linea; out debe abrirse con newline=""
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= chunk:
+            out.write("\r\n".join(buffer) + "\r\n")
+            buffer = []
+    if buffer:
+        out.write("\r\n".join(buffer) + "\r\n")
+
+
+def write_csv(rows, out):
+    #csv.writer consume el generador de a una fila y el archivo escribe por bloques
+    csv.writer(out).writerows(rows)
+
+
+def export_agenda(planner, fmt, out, resource_name=None, start_time=None, end_time=None):
+    if fmt == "ics":
+        write_ical(ical_lines(planner, resource_name, start_time, end_time), out)
+    else:
+        write_csv(csv_rows(planner, resource_name, start_time, end_time), out)
+
+
+def _ical_time(moment):
+    return moment.strftime("%Y%m%dT%H%M%S")
+
+
+def _escape(text):
+    return str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line):
+    #RFC 5545: lineas de hasta 75 octetos; las siguientes empiezan con un espacio
+    if len(line.encode("utf-8")) <= 75:
+        return line
+    parts = []
+    current = ""
+    size = 0
+    for char in line:
+        width = len(char.encode("utf-8"))
+        if size + width > (75 if not parts else 74):
+            parts.append(current)
+            current, size = "", 0
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta agendas de Ctrl + Alt + Repair a iCalendar o CSV")
+    parser.add_argument("format", choices=("ics", "csv"))
+    parser.add_argument("--resource", help="solo la agenda de este recurso (por defecto todo el taller)")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat)
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat)
+    parser.add_argument("--output", default="-", help="archivo de salida (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    planner = Planner()
+    #Solo lectura: el estado sale del snapshot y el journal sin abrir el journal para escribir
+    PlannerJournal().replay(planner)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        export_agenda(planner, args.format, out, args.resource, args.start, args.end)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
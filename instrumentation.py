@@ -0,0 +1,78 @@
+import json
+import time
+from contextlib import nullcontext
+
+
+class PlannerStats:
+    #Contadores y tiempos de las rutas calientes del planner. Desactivado (enabled=False) cada punto de
+    #medicion solo revisa el flag, asi se puede dejar instrumentado en produccion
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        #nombre -> [llamadas, segundos totales, maximo]
+        self.timers = {}
+        self.since = time.time()
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def timer(self, name):
+        if not self.enabled:
+            return nullcontext()
+        return _Timer(self, name)
+
+    def add_time(self, name, seconds):
+        entry = self.timers.get(name)
+        if entry is None:
+            entry = self.timers[name] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+        if seconds > entry[2]:
+            entry[2] = seconds
+
+    def snapshot(self):
+        return {
+            "since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.since)),
+            "until": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "counters": dict(sorted(self.counters.items())),
+            "timers": {
+                name: {"calls": calls, "total_ms": total * 1000, "avg_ms": total * 1000 / calls, "max_ms": longest * 1000}
+                for name, (calls, total, longest) in sorted(self.timers.items())
+            },
+        }
+
+    def reset(self):
+        self.counters = {}
+        self.timers = {}
+        self.since = time.time()
+
+    def dump(self, filename):
+        #Agrega el snapshot como una linea JSON, para juntar mediciones de varias sesiones
+        with open(filename, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.snapshot(), ensure_ascii=False) + "\n")
+
+    def report_lines(self):
+        data = self.snapshot()
+        lines = [f"Desde {data['since']} hasta {data['until']}"]
+        if not data["counters"] and not data["timers"]:
+            lines.append("  (sin mediciones)")
+        for name, value in data["counters"].items():
+            lines.append(f"  {name}: {value}")
+        for name, t in data["timers"].items():
+            lines.append(f"  {name}: {t['calls']} llamadas, total {t['total_ms']:.2f} ms, promedio {t['avg_ms']:.3f} ms, max {t['max_ms']:.3f} ms")
+        return lines
+
+
+class _Timer:
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stats.add_time(self.name, time.perf_counter() - self.started)
+        return False
@@ -0,0 +1,174 @@
+import json
+import os
+from models import Resource
+from storage import SAVE_DIR, DEFAULT_FILE, save_planner_state, read_state_file, apply_state, event_record, event_from_record
+
+JOURNAL_FILE = os.path.join(SAVE_DIR, "journal.jsonl")
+#Cantidad de cambios en el journal a partir de la cual 'save' compacta en el snapshot
+COMPACT_EVERY = 500
+
+def event_key(ev):
+    #Clave de los journals anteriores a los ids de evento (se sigue aceptando al reaplicar)
+    return [ev.event_title, ev.start_time.isoformat(), ev.end_time.isoformat()]
+
+
+class PlannerJournal:
+    #Journal de escritura anticipada: cada cambio del planner se agrega como una linea JSON al final de
+    #journal.jsonl (O(1) por cambio). Al compactar se escribe el snapshot (data.json) y el journal se vacia.
+    #Al iniciar se carga el snapshot y se reaplican solo los cambios posteriores a el (por numero de secuencia).
+    #Con un archive (archive.ShardArchive), al compactar los eventos ya vencidos pasan al archivo historico
+    def __init__(self, snapshot_file=DEFAULT_FILE, journal_file=JOURNAL_FILE, compact_every=COMPACT_EVERY, archive=None):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.compact_every = compact_every
+        self.archive = archive
+        self.planner = None
+        self.pending = 0
+        self._seq = 0
+        self._handle = None
+
+    def load(self, planner, trusted=True):
+        #Devuelve (si habia snapshot, cantidad de cambios reaplicados desde el journal)
+        loaded = self.replay(planner, trusted, repair=True)
+        self.attach(planner)
+        return loaded
+
+    def replay(self, planner, trusted=True, repair=False):
+        #Carga el snapshot y reaplica el journal sin engancharse al planner: solo lee los archivos, asi sirve
+        #para herramientas de solo lectura como export.py. Con repair (load) se recorta la linea incompleta que
+        #deje una caida; sin repair solo se ignora. Devuelve lo mismo que load
+        self.detach()
+        snapshot_seq = 0
+        has_snapshot = os.path.exists(self.snapshot_file)
+        with planner.stats.timer("load"):
+            if has_snapshot:
+                data = read_state_file(self.snapshot_file)
+                apply_state(planner, data, trusted)
+                snapshot_seq = data.get("journal_seq", 0)
+        self._seq = snapshot_seq
+        with planner.stats.timer("journal_replay"):
+            replayed = self._replay(planner, snapshot_seq, repair)
+        return has_snapshot, replayed
+
+    def attach(self, planner):
+        self.detach()
+        self.planner = planner
+        planner.change_listeners.append(self.record)
+        self._handle = open(self.journal_file, "a", encoding="utf-8")
+
+    def detach(self):
+        if self.planner is not None and self.record in self.planner.change_listeners:
+            self.planner.change_listeners.remove(self.record)
+        self.planner = None
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def record(self, op, payload):
+        self._seq += 1
+        entry = {"seq": self._seq, "op": op}
+        if op == "add":
+            entry["event"] = event_record(payload["event"])
+        elif op in ("remove", "cancel", "truncate", "status"):
+            entry["id"] = payload["event"].event_id
+            if op == "cancel":
+                entry["index"] = payload["index"]
+            elif op == "truncate":
+                entry["count"] = payload["count"]
+            elif op == "status":
+                entry["status"] = payload["status"]
+        elif op == "resource":
+            entry["name"] = payload["resource"].resource_name
+            entry["attributes"] = payload["resource"].resource_attributes
+        else:
+            entry.update(payload)
+        with self.planner.stats.timer("journal_write"):
+            self._handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._handle.flush()
+        self.pending += 1
+
+    def checkpoint(self):
+        #Asegura en disco lo escrito; compacta solo cuando el journal ya es largo. Devuelve si compacto
+        if self._handle is not None:
+            os.fsync(self._handle.fileno())
+        if self.pending >= self.compact_every:
+            self.compact()
+            return True
+        return False
+
+    def compact(self):
+        if self.archive is not None:
+            self.archive.archive_expired(self.planner)
+        save_planner_state(self.planner, self.snapshot_file, indent=None, journal_seq=self._seq)
+        #Si algo falla antes de vaciar el journal, journal_seq evita aplicar dos veces lo ya compactado
+        self._handle.close()
+        self._handle = open(self.journal_file, "w", encoding="utf-8")
+        self.pending = 0
+
+    def _replay(self, planner, after_seq, repair=True):
+        if not os.path.exists(self.journal_file):
+            return 0
+        entries = {}
+        for ev in planner.scheduled_events:
+            entries[tuple(event_key(ev))] = ev
+        replayed = 0
+        #Las altas consecutivas se restauran juntas (un solo ordenamiento por recurso)
+        added = []
+        valid_bytes = 0
+        with open(self.journal_file, "rb") as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("linea incompleta")
+                    entry = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    #Linea incompleta por una caida a mitad de escritura: se descarta para seguir escribiendo detras
+                    if repair:
+                        with open(self.journal_file, "r+b") as broken:
+                            broken.truncate(valid_bytes)
+                    break
+                valid_bytes += len(line)
+                if entry["seq"] <= after_seq:
+                    continue
+                if entry["op"] == "add":
+                    ev = event_from_record(entry["event"])
+                    added.append(ev)
+                    entries[tuple(event_key(ev))] = ev
+                else:
+                    planner.restore_events(added)
+                    added = []
+                    self._apply(planner, entry, entries)
+                self._seq = entry["seq"]
+                self.pending += 1
+                replayed += 1
+        planner.restore_events(added)
+        return replayed
+
+    def _apply(self, planner, entry, entries):
+        op = entry["op"]
+        if op in ("remove", "cancel", "truncate", "status"):
+            if "id" in entry:
+                ev = planner.events_by_id.get(entry["id"])
+            else:
+                ev = entries.get(tuple(entry["key"]))
+            if ev is None or not planner.is_scheduled(ev):
+                return
+            if op == "remove":
+                planner.remove_event(ev)
+            elif op == "cancel":
+                planner.remove_event(ev.occurrence(entry["index"]))
+            elif op == "truncate":
+                planner.remove_event(ev.occurrence(entry["count"]), "following")
+            else:
+                planner.update_event_status(ev, entry["status"])
+        elif op == "resource":
+            planner.add_resource(Resource(entry["name"], entry.get("attributes")))
+        elif op == "pool":
+            planner.set_pool(entry["name"], entry["quantity"])
+        elif op == "corequisite":
+            planner.add_corequisite(entry["a"], entry["b"])
+        elif op == "exclusion":
+            planner.add_exclusion(entry["a"], entry["b"])
+        elif op == "clear":
+            planner.clear()
+            entries.clear()
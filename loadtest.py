@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from benchmark import build_workshop, percentile
+from concurrency import SharedPlanner
+from server import PlannerServer, DEFAULT_PORT, WORKERS
+
+#Prueba de carga para server.py: varios clientes (conexiones) mandan reservas a la vez, cada uno con hasta
+#'window' pedidos en vuelo, y se mide cuantas reservas por segundo acepta el servidor y la latencia de cada
+#pedido. Una fraccion 'reads' son lecturas (agenda de un dia o quien esta libre) mezcladas con las reservas.
+#Con --spawn se levanta en este mismo proceso un servidor descartable con el taller sintetico del benchmark
+#(sin journal), asi no se toca el estado guardado.
+#Uso: python loadtest.py --spawn [--clients 8] [--requests 500] [--window 16] [--reads 0.2] [--json salida.json]
+
+START = datetime(2030, 1, 7, 8, 0)
+
+
+def make_requests(resources, count, reads, days, rnd):
+    #Reservas de 30 a 120 minutos en una grilla de media hora sobre 'days' dias; las que caen sobre otra del
+    #mismo recurso se rechazan, como pasaria con dos recepcionistas reservando el mismo hueco
+    requests = []
+    for i in range(count):
+        day = START + timedelta(days=rnd.randrange(days))
+        if rnd.random() < reads:
+            if rnd.random() < 0.5:
+                requests.append({"op": "agenda", "resource": rnd.choice(resources), "from": day.isoformat(),
+                                 "to": (day + timedelta(days=1)).isoformat(), "limit": 20})
+            else:
+                start = day + timedelta(minutes=30 * rnd.randrange(16))
+                requests.append({"op": "free", "from": start.isoformat(), "to": (start + timedelta(hours=1)).isoformat()})
+            continue
+        start = day + timedelta(minutes=30 * rnd.randrange(16))
+        end = start + timedelta(minutes=30 * rnd.randint(1, 4))
+        requests.append({"op": "book", "event": {"title": f"Carga {i}", "start": start.isoformat(), "end": end.isoformat(),
+                                                 "resources": rnd.sample(resources, rnd.randint(1, 2)), "client": f"Cliente {i % 50}"}})
+    return requests
+
+
+async def run_client(host, port, unix_path, requests, window, results):
+    if unix_path:
+        reader, writer = await asyncio.open_unix_connection(unix_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    in_flight = {}
+    slots = asyncio.Semaphore(window)
+
+    async def receive():
+        for _ in requests:
+            line = await reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            op, sent = in_flight.pop(response["req"])
+            results.append((op, response["ok"], time.perf_counter() - sent))
+            slots.release()
+
+    receiver = asyncio.create_task(receive())
+    for number, request in enumerate(requests):
+        await slots.acquire()
+        request = dict(request, req=number)
+        in_flight[number] = (request["op"], time.perf_counter())
+        writer.write((json.dumps(request) + "\n").encode("utf-8"))
+        await writer.drain()
+    await receiver
+    writer.close()
+
+
+async def run_load(host="127.0.0.1", port=DEFAULT_PORT, unix_path=None, clients=8, requests=500, window=16,
+                   reads=0.2, days=30, seed=0, spawn=False, workers=None):
+    rnd = random.Random(seed)
+    server = listener = None
+    if spawn:
+        planner, tech_names, pool_names = build_workshop(seed=seed)
+        server = PlannerServer(SharedPlanner(planner), None, workers or WORKERS)
+        listener = await server.start("127.0.0.1", 0, unix_path)
+        if not unix_path:
+            port = listener.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await (asyncio.open_unix_connection(unix_path) if unix_path else asyncio.open_connection(host, port))
+        writer.write(b'{"op": "resources"}\n')
+        resources = json.loads(await reader.readline())["resources"]
+        writer.close()
+        batches = [make_requests(resources, requests, reads, days, rnd) for _ in range(clients)]
+        results = []
+        started = time.perf_counter()
+        await asyncio.gather(*(run_client(host, port, unix_path, batch, window, results) for batch in batches))
+        elapsed = time.perf_counter() - started
+    finally:
+        if listener is not None:
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+    return summarize(results, elapsed, clients, window)
+
+
+def summarize(results, elapsed, clients, window):
+    books = sorted(latency for op, ok, latency in results if op == "book")
+    reads = sorted(latency for op, ok, latency in results if op != "book")
+    accepted = sum(1 for op, ok, latency in results if op == "book" and ok)
+    report = {
+        "clients": clients,
+        "window": window,
+        "requests": len(results),
+        "elapsed_s": elapsed,
+        "requests_per_s": len(results) / elapsed if elapsed else 0.0,
+        "bookings": len(books),
+        "accepted": accepted,
+        "rejected": len(books) - accepted,
+        "bookings_per_s": len(books) / elapsed if elapsed else 0.0,
+        "accepted_per_s": accepted / elapsed if elapsed else 0.0,
+    }
+    for name, samples in (("book", books), ("read", reads)):
+        report[name] = {f"p{int(q * 100)}_ms": percentile(samples, q) * 1000 for q in (0.50, 0.95, 0.99)}
+    return report
+
+
+def print_report(report):
+    print(f"{report['clients']} clientes x ventana {report['window']}: {report['requests']} pedidos en {report['elapsed_s']:.2f} s "
+          f"({report['requests_per_s']:.0f} pedidos/s)")
+    print(f"Reservas: {report['bookings']} ({report['accepted']} aceptadas, {report['rejected']} rechazadas) -> "
+          f"{report['bookings_per_s']:.0f} reservas/s, {report['accepted_per_s']:.0f} aceptadas/s")
+    for name in ("book", "read"):
+        stats = report[name]
+        print(f"  latencia {name}: p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor de Ctrl + Alt + Repair")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="socket Unix del servidor")
+    parser.add_argument("--spawn", action="store_true", help="levanta un servidor descartable en este proceso")
+    parser.add_argument("--workers", type=int, help="hilos de escritura del servidor levantado con --spawn")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500, help="pedidos por cliente")
+    parser.add_argument("--window", type=int, default=16, help="pedidos en vuelo por cliente")
+    parser.add_argument("--reads", type=float, default=0.2, help="fraccion de lecturas")
+    parser.add_argument("--days", type=int, default=30, help="dias sobre los que se reparten las reservas")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="guarda el resultado en este archivo")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load(args.host, args.port, args.unix, args.clients, args.requests, args.window,
+                                  args.reads, args.days, args.seed, args.spawn, args.workers))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
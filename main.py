@@ -1,4 +1,10 @@
-from cli import run_cli
+import time
+#Antes de importar el resto: el tiempo hasta el prompt incluye las importaciones
+STARTED = time.perf_counter()
+import sys
+from cli import run_cli, run_batch
 
 if __name__ == "__main__":
-    run_cli()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        raise SystemExit(run_batch(sys.argv[1:]))
+    run_cli(STARTED)
\ No newline at end of file
@@ -1,62 +1,293 @@
 from datetime import datetime, timedelta
+from math import gcd, lcm
+
+#Los instantes se guardan como segundos enteros desde la epoca Unix (fechas sin zona horaria)
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+
+def to_epoch_seconds(moment):
+    return (moment - EPOCH) // ONE_SECOND
+
+def from_epoch_seconds(seconds):
+    return EPOCH + timedelta(seconds=seconds)
+
+#Los nombres de recursos se internan una sola vez como enteros pequenos; cada evento guarda esos ids
+#y una mascara de bits con ellos, asi las pruebas de pertenencia y de recursos compartidos son operaciones de bits
+_RESOURCE_IDS = {}
+_RESOURCE_NAMES = []
+
+def resource_id(name):
+    rid = _RESOURCE_IDS.get(name)
+    if rid is None:
+        rid = _RESOURCE_IDS[name] = len(_RESOURCE_NAMES)
+        _RESOURCE_NAMES.append(name)
+    return rid
+
+def resource_name(rid):
+    return _RESOURCE_NAMES[rid]
+
+def resource_mask(names):
+    mask = 0
+    for name in names:
+        mask |= 1 << resource_id(name)
+    return mask
+
+def mask_ids(mask):
+    #Ids presentes en una mascara, de menor a mayor
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
 
 class Resource:
+    __slots__ = ("resource_name", "resource_attributes", "resource_id")
+
     def __init__(self, resource_name, resource_attributes = None):
         self.resource_name = resource_name
         self.resource_attributes = resource_attributes
-    
+        self.resource_id = resource_id(resource_name)
+
     def __repr__(self):
         return f"Resource({self.resource_name})"
 
 class Event:
-    def __init__(self, event_title, start_time, end_time, required_resources, event_metadata = None, recurrence_pattern = None, status = "pendiente"):
+    __slots__ = (
+        "event_title", "start_key", "end_key", "resource_ids", "resource_mask",
+        "event_metadata", "recurrence_pattern", "status", "series", "occurrence_index", "_rule", "event_id",
+    )
+
+    def __init__(self, event_title, start_time, end_time, required_resources, event_metadata = None, recurrence_pattern = None, status = "pendiente", event_id = None):
         self.event_title = event_title
+        #Id estable del evento o serie; lo asigna el planner al agendarlo y se guarda con el estado
+        self.event_id = event_id
         try:
-            self.start_time = start_time if isinstance(start_time, datetime) else datetime.fromisoformat(start_time)
-            self.end_time = end_time if isinstance(end_time, datetime) else datetime.fromisoformat(end_time)
+            start_time = start_time if isinstance(start_time, datetime) else datetime.fromisoformat(start_time)
+            end_time = end_time if isinstance(end_time, datetime) else datetime.fromisoformat(end_time)
         except Exception:
             raise ValueError("Formato de fecha inválido, usa YYYY-MM-DDTHH:MM:SS")
-        if self.end_time <= self.start_time:
+        if end_time <= start_time:
             raise ValueError("El tiempo de finalizacion debe ser despues del de inicio")
-        self.required_resources = list(required_resources)
+        self.start_key = to_epoch_seconds(start_time)
+        self.end_key = to_epoch_seconds(end_time)
+        if self.end_key <= self.start_key:
+            raise ValueError("El tiempo de finalizacion debe ser despues del de inicio")
+        self.required_resources = required_resources
         self.event_metadata = event_metadata or {}
         self.recurrence_pattern = recurrence_pattern
         self.status = status
-    
+        #Si el evento es una ocurrencia de una serie: el evento que guarda la regla y su indice
+        self.series = None
+        self.occurrence_index = None
+        self._rule = None
+
+    @classmethod
+    def from_keys(cls, event_title, start_key, end_key, resource_ids, resource_mask, event_metadata, recurrence_pattern, status):
+        #Constructor interno (sin conversiones) para ocurrencias y copias de eventos ya validos
+        ev = cls.__new__(cls)
+        ev.event_title = event_title
+        ev.start_key = start_key
+        ev.end_key = end_key
+        ev.resource_ids = resource_ids
+        ev.resource_mask = resource_mask
+        ev.event_metadata = event_metadata
+        ev.recurrence_pattern = recurrence_pattern
+        ev.status = status
+        ev.series = None
+        ev.occurrence_index = None
+        ev._rule = None
+        ev.event_id = None
+        return ev
+
+    @property
+    def start_time(self):
+        return from_epoch_seconds(self.start_key)
+
+    @property
+    def end_time(self):
+        return from_epoch_seconds(self.end_key)
+
+    @property
+    def required_resources(self):
+        return [_RESOURCE_NAMES[rid] for rid in self.resource_ids]
+
+    @required_resources.setter
+    def required_resources(self, names):
+        self.resource_ids = tuple(resource_id(name) for name in names)
+        mask = 0
+        for rid in self.resource_ids:
+            mask |= 1 << rid
+        self.resource_mask = mask
+
+    @property
+    def ref(self):
+        #Referencia para buscar el evento: "12", o "12#3" para la tercera ocurrencia de la serie 12
+        if self.occurrence_index is None:
+            return str(self.event_id)
+        return f"{self.event_id}#{self.occurrence_index + 1}"
+
+    def uses_resource(self, name):
+        rid = _RESOURCE_IDS.get(name)
+        return rid is not None and bool(self.resource_mask >> rid & 1)
+
+    def units_of(self, rid):
+        return self.resource_ids.count(rid)
+
     def __repr__(self):
         return f"Event({self.event_title}, {self.start_time.isoformat()} => {self.end_time.isoformat()}, {self.required_resources})"
-    
+
     def overlaps(self, other_event):
-        return not (self.end_time <= other_event.start_time or self.start_time >= other_event.end_time)
-    
-    def generate_recurrence_occurrences(self):
-        if not self.recurrence_pattern:
-            return[self]
-        frequency = self.recurrence_pattern.get("freq")
-        count = int(self.recurrence_pattern.get("count", 1))
-        if frequency == "daily":
-            delta = timedelta(days=1)
-        elif frequency == "weekly":
-            delta = timedelta(weeks=1)
-        elif frequency == "monthly":
-            delta = timedelta(days=30)
+        return not (self.end_key <= other_event.start_key or self.start_key >= other_event.end_key)
+
+    def recurrence_rule(self):
+        #Las ocurrencias ya expandidas no vuelven a generar su serie
+        if self.series is not None or not self.recurrence_pattern:
+            return None
+        if self._rule is None:
+            self._rule = RecurrenceRule.from_pattern(self.start_key, self.end_key - self.start_key, self.recurrence_pattern)
+        return self._rule
+
+    def occurrence(self, index):
+        rule = self.recurrence_rule()
+        offset = index * rule.step
+        occ = Event.from_keys(
+            f"{self.event_title} (#{index+1})",
+            self.start_key + offset,
+            self.end_key + offset,
+            self.resource_ids,
+            self.resource_mask,
+            self.event_metadata,
+            self.recurrence_pattern,
+            self.status
+        )
+        occ.series = self
+        occ.occurrence_index = index
+        occ.event_id = self.event_id
+        return occ
+
+    def cancel_occurrence(self, index):
+        rule = self.recurrence_rule()
+        rule.cancelled.add(index)
+        self.recurrence_pattern["cancelled"] = sorted(rule.cancelled)
+
+    def truncate_series(self, index):
+        #La serie termina justo antes de la ocurrencia index (se descartan las cancelaciones posteriores)
+        rule = self.recurrence_rule()
+        if rule.count is not None and index >= rule.count:
+            return
+        self.recurrence_pattern["count"] = index
+        cancelled = sorted(i for i in rule.cancelled if i < index)
+        if cancelled:
+            self.recurrence_pattern["cancelled"] = cancelled
         else:
+            self.recurrence_pattern.pop("cancelled", None)
+        self._rule = None
+
+    def generate_recurrence_occurrences(self, window_start=None, window_end=None):
+        #Expande la serie solo dentro de la ventana pedida; una serie sin fin necesita window_end
+        rule = self.recurrence_rule()
+        if rule is None:
             return [self]
-        
-        occurrences = []
-        for i in range(count):
-            start = self.start_time + i * delta
-            end = self.end_time + i * delta
-            occ = Event(
-                f"{self.event_title} (#{i+1})", 
-                start, 
-                end, 
-                self.required_resources, 
-                self.event_metadata,
-                self.recurrence_pattern,
-                self.status
-            )
-            occurrences.append(occ)
-        return occurrences    
-        
-    
\ No newline at end of file
+        if window_end is None and rule.count is None:
+            raise ValueError("La serie no tiene fin, indica hasta cuando expandirla")
+        start_key = rule.start_key if window_start is None else to_epoch_seconds(window_start)
+        end_key = None if window_end is None else to_epoch_seconds(window_end)
+        return [self.occurrence(i) for i in rule.indices_between(start_key, end_key)]
+
+
+DAY_SECONDS = 86400
+RECURRENCE_STEPS = {
+    "daily": DAY_SECONDS,
+    "weekly": 7 * DAY_SECONDS,
+    "monthly": 30 * DAY_SECONDS,
+}
+
+class RecurrenceRule:
+    #Regla de una serie: inicio, duracion, frecuencia y count/until (sin ninguno de los dos la serie no tiene fin).
+    #Todo en segundos desde la epoca: la ocurrencia i ocupa [inicio + i*paso, inicio + i*paso + duracion)
+    def __init__(self, start_key, duration, frequency, count=None, until=None, cancelled=None):
+        self.start_key = start_key
+        self.duration = duration
+        self.frequency = frequency
+        self.step = RECURRENCE_STEPS[frequency]
+        if until is not None:
+            until = until if isinstance(until, datetime) else datetime.fromisoformat(until)
+            until_count = (to_epoch_seconds(until) - start_key) // self.step + 1
+            count = until_count if count is None else min(int(count), until_count)
+        self.count = None if count is None else max(int(count), 0)
+        self.cancelled = set(cancelled or ())
+
+    @classmethod
+    def from_pattern(cls, start_key, duration, pattern):
+        if pattern.get("freq") not in RECURRENCE_STEPS:
+            return None
+        return cls(start_key, duration, pattern["freq"], pattern.get("count"), pattern.get("until"), pattern.get("cancelled"))
+
+    def occurrence_start(self, index):
+        return self.start_key + index * self.step
+
+    @property
+    def end_key(self):
+        if self.count is None:
+            return None
+        return self.occurrence_start(max(self.count - 1, 0)) + self.duration
+
+    def index_range(self, window_start, window_end=None):
+        #Indices cuyas ocurrencias se solapan con [window_start, window_end), sin contar cancelaciones
+        first = max((window_start - self.start_key - self.duration) // self.step + 1, 0)
+        last = None if window_end is None else -((self.start_key - window_end) // self.step) - 1
+        if self.count is not None:
+            last = self.count - 1 if last is None else min(last, self.count - 1)
+        return range(first, last + 1)
+
+    def indices_between(self, window_start, window_end=None):
+        if window_end is None and self.count is None:
+            raise ValueError("La serie no tiene fin, indica hasta cuando expandirla")
+        for index in self.index_range(window_start, window_end):
+            if index not in self.cancelled:
+                yield index
+
+    def is_active(self, index):
+        return index >= 0 and index not in self.cancelled and (self.count is None or index < self.count)
+
+    def first_active_index(self):
+        index = 0
+        while index in self.cancelled:
+            index += 1
+        return index if self.count is None or index < self.count else None
+
+    def first_index_between(self, window_start, window_end):
+        return next(self.indices_between(window_start, window_end), None)
+
+    def may_overlap(self, other):
+        #Dos ocurrencias se solapan si la diferencia de inicios cae en (-duracion propia, duracion de la otra).
+        #Esa diferencia siempre es congruente con la de los inicios modulo mcd(pasos), lo que descarta
+        #en O(1) las series que nunca pueden coincidir (por ejemplo, a otra hora del dia)
+        modulus = gcd(self.step, other.step)
+        offset = self.start_key - other.start_key
+        lowest = -self.duration + 1
+        highest = other.duration - 1
+        return lowest + (offset - lowest) % modulus <= highest
+
+    def first_conflict_index(self, other):
+        #Primer indice de esta serie que choca con una ocurrencia no cancelada de la otra, o None
+        if not self.may_overlap(other):
+            return None
+        ends = [end for end in (self.end_key, other.end_key) if end is not None]
+        if ends:
+            horizon = min(ends)
+        else:
+            #Ambas sin fin: pasadas las cancelaciones, el patron se repite cada mcm(pasos)
+            horizon = max(self.start_key, other.start_key, self._last_cancelled_end(), other._last_cancelled_end())
+            horizon += lcm(self.step, other.step) + self.duration + other.duration
+        for index in self.indices_between(other.start_key, horizon):
+            start = self.occurrence_start(index)
+            if other.first_index_between(start, start + self.duration) is not None:
+                return index
+        return None
+
+    def _last_cancelled_end(self):
+        if not self.cancelled:
+            return self.start_key
+        return self.occurrence_start(max(self.cancelled)) + self.duration
@@ -0,0 +1,161 @@
+import heapq
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from models import Event, to_epoch_seconds
+from planner import SLOT_SEARCH_HORIZON
+
+
+class BacklogJob:
+    #Trabajo pendiente de agendar. Sin resources se asigna solo (auto_assign, con los requisitos del catalogo);
+    #con resources se usan esos recursos y solo se busca el horario
+    def __init__(self, title, duration, priority=0, deadline=None, resources=None, event_metadata=None):
+        self.title = title
+        self.duration = duration
+        self.priority = priority
+        self.deadline = deadline if deadline is None or isinstance(deadline, datetime) else datetime.fromisoformat(deadline)
+        self.resources = resources
+        self.event_metadata = event_metadata or {}
+
+    def __repr__(self):
+        return f"BacklogJob({self.title}, {self.duration}, prioridad={self.priority})"
+
+
+def load_backlog(filename):
+    #Lista JSON de {"title", "duration_minutes", "priority", "deadline", "resources", "client"}
+    with open(filename, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    jobs = []
+    for j in data:
+        metadata = {"client": j["client"]} if j.get("client") else {}
+        jobs.append(BacklogJob(j["title"], timedelta(minutes=j["duration_minutes"]), j.get("priority", 0),
+                               j.get("deadline"), j.get("resources"), metadata))
+    return jobs
+
+
+def optimize_backlog(planner, jobs, search_from, time_budget=2.0, search_until=None, commit=True, seed=0):
+    #Agenda un backlog completo sobre el estado actual del planner (respetando recursos, pools y restricciones).
+    #1) Lista por prioridad: una cola (prioridad, deadline, duracion) fija el orden y cada trabajo toma
+    #   el primer hueco posible. 2) Busqueda local: se intercambian dos trabajos del orden y solo se vuelven
+    #   a ubicar los que quedan desde la primera posicion cambiada; se acepta si mejora el costo
+    #   (sin agendar, atraso ponderado, makespan, fin ponderado). Se corta al agotar time_budget (segundos)
+    #   o tras n*n intercambios seguidos sin mejora.
+    #commit=False deja el planner como estaba y solo devuelve la propuesta
+    started = time.perf_counter()
+    if search_until is None:
+        search_until = search_from + SLOT_SEARCH_HORIZON
+    rng = random.Random(seed)
+
+    queue = [(-job.priority, job.deadline or datetime.max, -job.duration, index) for index, job in enumerate(jobs)]
+    heapq.heapify(queue)
+    order = [heapq.heappop(queue)[3] for _ in range(len(jobs))]
+
+    #Las pruebas no se avisan a los listeners (journal); solo el resultado final
+    listeners, planner.change_listeners = planner.change_listeners, []
+    try:
+        placed = [None] * len(order)
+        _place_from(planner, jobs, order, placed, 0, search_from, search_until)
+        best_cost = _cost(jobs, order, placed, search_from)
+        iterations = 0
+        stalled = 0
+        while len(order) > 1 and stalled < len(order) ** 2 and time.perf_counter() - started < time_budget:
+            iterations += 1
+            stalled += 1
+            i, j = sorted(rng.sample(range(len(order)), 2))
+            previous = placed[i:]
+            _unplace(planner, placed, i)
+            order[i], order[j] = order[j], order[i]
+            _place_from(planner, jobs, order, placed, i, search_from, search_until)
+            cost = _cost(jobs, order, placed, search_from)
+            if cost < best_cost:
+                best_cost = cost
+                stalled = 0
+                continue
+            #No mejora: se deshace el intercambio y se restauran los eventos anteriores (ya validados juntos)
+            _unplace(planner, placed, i)
+            order[i], order[j] = order[j], order[i]
+            placed[i:] = previous
+            planner.restore_events([entry[0] for entry in previous if entry[0] is not None])
+        _unplace(planner, placed, 0)
+    finally:
+        planner.change_listeners = listeners
+
+    scheduled = [(jobs[index], entry[0]) for index, entry in zip(order, placed) if entry[0] is not None]
+    unscheduled = [(jobs[index], entry[1]) for index, entry in zip(order, placed) if entry[0] is None]
+    events = sorted((ev for job, ev in scheduled), key=lambda ev: ev.start_key)
+    if commit and events:
+        ok, report = planner.schedule_many(events, atomic=True)
+        if not ok:
+            events = []
+            unscheduled = [(job, next(msg for ev, ok, msg in report if not ok)) for job in jobs]
+    return {
+        "events": events,
+        "unscheduled": unscheduled,
+        "late": [(job, ev) for job, ev in scheduled if job.deadline is not None and ev.end_time > job.deadline],
+        "makespan": max((ev.end_time for ev in events), default=search_from) - search_from,
+        "utilization": _utilization(planner, events, search_from),
+        "iterations": iterations,
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+def _place_from(planner, jobs, order, placed, position, search_from, search_until):
+    for k in range(position, len(order)):
+        placed[k] = _place(planner, jobs[order[k]], search_from, search_until)
+
+
+def _unplace(planner, placed, position):
+    for ev, msg in placed[position:]:
+        if ev is not None:
+            planner.remove_event(ev)
+
+
+def _place(planner, job, search_from, search_until):
+    #Devuelve (evento agendado, None) o (None, motivo)
+    if job.resources is None:
+        ev, msg = planner.auto_assign(job.title, job.duration, search_from, search_until, dict(job.event_metadata))
+        if ev is None:
+            return None, msg
+    else:
+        template = Event(job.title, search_from, search_from + job.duration, job.resources, dict(job.event_metadata))
+        slots = planner.find_available_slots(template, search_from, 1, search_until)
+        if not slots:
+            ok, msg = planner.validate_event(template)
+            return None, msg or "No se encontro hueco en el rango"
+        ev = Event(job.title, slots[0][0], slots[0][1], job.resources, template.event_metadata)
+    ok, msg = planner.schedule_event(ev)
+    return (ev, None) if ok else (None, msg)
+
+
+def _cost(jobs, order, placed, search_from):
+    origin = to_epoch_seconds(search_from)
+    missing = 0
+    tardiness = 0
+    makespan = 0
+    completion = 0
+    for index, (ev, msg) in zip(order, placed):
+        job = jobs[index]
+        if ev is None:
+            missing += 1 + max(job.priority, 0)
+            continue
+        weight = 1 + max(job.priority, 0)
+        end = ev.end_key - origin
+        if job.deadline is not None and ev.end_key > to_epoch_seconds(job.deadline):
+            tardiness += weight * (ev.end_key - to_epoch_seconds(job.deadline))
+        makespan = max(makespan, end)
+        completion += weight * end
+    return missing, tardiness, makespan, completion
+
+
+def _utilization(planner, events, search_from):
+    #Fraccion del periodo [search_from, fin del ultimo trabajo) que cada recurso esta ocupado por el backlog;
+    #en los pools se divide ademas por la cantidad de unidades
+    if not events:
+        return {}
+    window = (max(ev.end_time for ev in events) - search_from).total_seconds()
+    busy = {}
+    for ev in events:
+        for name in ev.required_resources:
+            busy[name] = busy.get(name, 0) + (ev.end_key - ev.start_key)
+    return {name: seconds / (window * planner.resource_pools.get(name, 1)) for name, seconds in busy.items()}
@@ -1,12 +1,74 @@
-from datetime import timedelta
-from models import Event, Resource
+import re
+from datetime import datetime, timedelta
+from itertools import count, product
+from math import lcm
+from models import Event, Resource, resource_id, resource_name, resource_mask, mask_ids, to_epoch_seconds, from_epoch_seconds
+from timeline import ResourceTimeline, PoolOccupancy, AvailabilityMatrix, TIME_OFFSET
+from constraints import CompiledConstraints, ValidationCache
+from instrumentation import PlannerStats
+
+#Mismo alcance que la busqueda anterior (5000 pasos de 30 minutos)
+SLOT_SEARCH_HORIZON = timedelta(minutes=30) * 5000
+#Hasta donde se listan las series sin fecha de fin
+OPEN_SERIES_HORIZON = timedelta(days=365)
+OCCURRENCE_TITLE = re.compile(r"^(.*) \(#(\d+)\)$")
+#Franjas de la matriz de disponibilidad y horizonte que cubre a partir del dia consultado
+AVAILABILITY_SLOT = timedelta(minutes=15)
+AVAILABILITY_HORIZON = timedelta(days=90)
+#Campos con indice hash: valor -> {id: evento o serie}
+INDEXED_FIELDS = ("title", "client", "status")
+#Alcance de remove_event/update_event sobre una ocurrencia: solo esa, esa y las siguientes, o la serie completa
+SCOPES = ("this", "following", "series")
+
+def validation_key(event: Event):
+    return event.resource_ids, event.start_key, event.end_key, event.event_title
 
 class Planner:
     def __init__(self):
-        self.scheduled_events = []
+        #Eventos y series agendados por id estable, en orden de alta
+        self.events_by_id = {}
+        self._next_event_id = 1
+        #Indices secundarios (ver INDEXED_FIELDS) y los valores con que se indexo cada id
+        self.events_by_field = {field: {} for field in INDEXED_FIELDS}
+        self._indexed_as = {}
+        #Orden global por hora de inicio, mantenido al agregar/quitar: eventos sueltos en una linea de tiempo
+        #y las series aparte como {secuencia: evento de la serie}; las consultas por rango usan bisect
+        self.event_timeline = ResourceTimeline()
+        self.series_index = {}
+        #Indice por recurso: id del recurso -> ResourceTimeline con los eventos que lo usan
+        self.resource_timelines = {}
+        #Series (reglas de recurrencia) por recurso: id del recurso -> {secuencia: evento de la serie}
+        self.resource_series = {}
+        #Ocupacion por pool: id del pool -> PoolOccupancy con las unidades en uso en cada instante
+        self.pool_occupancy = {}
+        #Unidades de pools que ocupa cada evento agendado (id(evento) -> {id del pool: unidades}), calculadas al
+        #indexarlo con _pool_units_needed: las que lista y las que pide su trabajo del catalogo aunque no las liste
+        self._pool_demand = {}
+        #AvailabilityMatrix (bitsets por recurso y franja); se arma con la primera consulta de disponibilidad
+        self._availability = None
+        #Recursos, restricciones y catalogo compilados (CompiledConstraints); None => se recompilan al validar
+        self._constraints = None
+        #Validaciones ya calculadas (None => sin cache). _change_stamp sube despues de cada cambio en la agenda y
+        #_resource_stamps guarda, por id de recurso, el sello del ultimo cambio que lo toco
+        self.validation_cache = ValidationCache()
+        self._change_stamp = 0
+        self._resource_stamps = {}
+        self._event_sequence = {}
+        self._sequence_counter = count()
+        #Vista ordenada de scheduled_events como (sello, lista); vale mientras _events_stamp no cambie. El sello
+        #sube como ultimo paso de cada alta o baja en events_by_id (las altas ya tienen su secuencia), y la vista
+        #lleva el sello leido antes de armarla: una vista armada cruzada con un cambio queda con un sello viejo y
+        #se descarta en la siguiente lectura. Eso no hace correcta a esa lectura: la reintenta SharedPlanner.read
+        self._scheduled_view = None
+        self._events_stamp = 0
         self.available_resources = {}
         self.resource_restrictions = {"corequisite": [], "exclusion": []}
         self.resource_pools = {}
+        #Funciones que reciben cada cambio del estado como (op, datos), por ejemplo el journal de storage
+        self.change_listeners = []
+        self._held_changes = None
+        #Contadores y tiempos de las rutas calientes (desactivados por defecto, ver instrumentation.py)
+        self.stats = PlannerStats()
         #Catalogo que muestra todos los tipos de trabajo que se realizan en el taller, asi como los skills, pools y devices que requiere
         self.job_catalog = {
             #=== Mantenimiento de Hardware ===
@@ -83,113 +145,1076 @@ class Planner:
     
     def add_resource(self, resource: Resource):
         self.available_resources[resource.resource_name] = resource
+        self._constraints = None
+        self._notify("resource", resource=resource)
     
     def list_resource(self):
         return list(self.available_resources.values())
     
     def add_corequisite(self, resource_a, resource_b):
         self.resource_restrictions["corequisite"].append((resource_a, resource_b))
+        self._constraints = None
+        self._notify("corequisite", a=resource_a, b=resource_b)
     
     def add_exclusion(self, resource_a, resource_b):
         self.resource_restrictions["exclusion"].append((resource_a, resource_b))
+        self._constraints = None
+        self._notify("exclusion", a=resource_a, b=resource_b)
         
     def set_pool(self, resource_type_name: str, quantity: int):
         self.resource_pools[resource_type_name] = quantity
+        self._constraints = None
+        rid = resource_id(resource_type_name)
+        if rid not in self.pool_occupancy:
+            self._build_pool_occupancy(rid)
+        self._notify("pool", name=resource_type_name, quantity=quantity)
+
+    def _notify(self, op, **payload):
+        if self._held_changes is not None:
+            self._held_changes.append((op, payload))
+            return
+        for listener in self.change_listeners:
+            listener(op, payload)
+
+    def _rules(self):
+        if self._constraints is None:
+            self._constraints = CompiledConstraints(self.available_resources, self.resource_pools, self.resource_restrictions)
+        return self._constraints
         
     # --- Validación completa ---
     def validate_event(self, new_event: Event):
+        if not self.stats.enabled:
+            kind, msg = self._check_event(new_event)
+            return kind is None, msg
+        self.stats.count("validate_calls")
+        with self.stats.timer("validate_event"):
+            kind, msg = self._check_event(new_event)
+        if kind is not None:
+            self.stats.count(f"conflicts_{kind}")
+        return kind is None, msg
+
+    def check_rules(self, event: Event):
+        #Solo recursos, restricciones y catalogo (skills y dispositivos), sin mirar el horario ni los demas
+        #eventos; la usa la auditoria, que revisa los choques y la capacidad de los pools aparte
+        return self._check_event(event, timing=False)
+
+    def _check_event(self, new_event: Event, timing=True):
+        #Devuelve (tipo de rechazo, mensaje) o (None, None) si el evento es valido.
+        #Tipos: unknown, resource, pool, restriction, catalog
+        cache = self.validation_cache
+        if cache is None or not timing:
+            return self._evaluate_event(new_event, timing)
+        #El sello se toma antes de validar: un cambio que se cruce con la validacion deja la entrada vencida
+        seen = self._change_stamp
+        rules = self._rules()
+        requirements = self._job_requirements(new_event)
+        key = validation_key(new_event)
+        result = cache.get(key, rules, requirements, self._resource_stamps)
+        if result is None:
+            result = self._evaluate_event(new_event, timing)
+            rids = new_event.resource_ids
+            if requirements and requirements.get("pools"):
+                rids += tuple(resource_id(pool) for pool in requirements["pools"])
+            cache.put(key, result, rules, requirements, seen, rids)
+        return result
+
+    def _evaluate_event(self, new_event: Event, timing=True):
+        rules = self._rules()
         # 1. Recursos existentes
-        for res in new_event.required_resources:
-            if res not in self.available_resources and res not in self.resource_pools:
-                return False, f"Recurso inexistente: '{res}'"
-
-        # 2. Conflictos de tiempo y recursos
-        for existing in self.scheduled_events:
-            if existing.overlaps(new_event):
-                for resource_name in new_event.required_resources:
-                    if resource_name in existing.required_resources:
-                        return False, f"Conflicto: recurso '{resource_name}' ocupado por '{existing.event_title}'"
-                return False, f"Conflicto de horario con '{existing.event_title}'"
+        unknown = rules.first_unknown(new_event)
+        if unknown is not None:
+            return "unknown", f"Recurso inexistente: '{resource_name(unknown)}'"
+
+        # 2. Conflictos de tiempo y recursos (solo se revisan las lineas de tiempo de los recursos pedidos)
+        conflict = self._first_resource_conflict(new_event) if timing else None
+        if conflict:
+            busy_name, existing = conflict
+            kind = "pool" if busy_name in self.resource_pools else "resource"
+            return kind, f"Conflicto: recurso '{busy_name}' ocupado por '{existing.event_title}'"
 
         # 3. Restricciones
-        for req_a, req_b in self.resource_restrictions["corequisite"]:
-            if req_a in new_event.required_resources and req_b not in new_event.required_resources:
-                return False, f"Restricción: '{req_a}' requiere '{req_b}'"
-        for ex_a, ex_b in self.resource_restrictions["exclusion"]:
-            if ex_a in new_event.required_resources and ex_b in new_event.required_resources:
-                return False, f"Restricción: '{ex_a}' no puede coexistir con '{ex_b}'"
+        violation = rules.corequisite_violation(new_event)
+        if violation:
+            return "restriction", f"Restricción: '{violation[0]}' requiere '{violation[1]}'"
+        violation = rules.exclusion_violation(new_event)
+        if violation:
+            return "restriction", f"Restricción: '{violation[0]}' no puede coexistir con '{violation[1]}'"
 
         # 4. Catálogo de trabajos
-        job_requirements = self.job_catalog.get(new_event.event_title)
+        job_requirements = self._job_requirements(new_event)
         if job_requirements:
+            job = rules.job((new_event.series or new_event).event_title, job_requirements)
             # Skills
-            for skill in job_requirements.get("skills", []):
-                found = False
-                for res_name in new_event.required_resources:
-                    res = self.available_resources.get(res_name)
-                    if res and skill in res.resource_attributes.get("skills", []):
-                        found = True
-                        break
-                if not found:
-                    return False, f"Este trabajo requiere un especialista con la skill: '{skill}' pero no se encontro ninguno."
+            skill = job.missing_skill(new_event)
+            if skill is not None:
+                return "catalog", f"Este trabajo requiere un especialista con la skill: '{skill}' pero no se encontro ninguno."
 
-            # Pools
-            for pool, qty in job_requirements.get("pools", {}).items():
-                if self.resource_pools.get(pool, 0) < qty:
-                    return False, f"Este trabajo necesita {qty} unidad(es) de '{pool}', pero no hay suficientes en el taller."
+            # Pools (unidades libres durante todo el intervalo del evento)
+            for pool, rid, qty in job.pools if timing else ():
+                if self._units_free(rid, new_event.start_key, new_event.end_key) < qty:
+                    return "pool", f"Este trabajo necesita {qty} unidad(es) de '{pool}', pero no hay suficientes en el taller."
 
             # Devices
-            for device in job_requirements.get("devices", []):
-                if device not in new_event.required_resources:
-                    return False, f"Este trabajo requiere el dispositivo '{device}', pero no fue asignado."
+            device = job.missing_device(new_event)
+            if device is not None:
+                return "catalog", f"Este trabajo requiere el dispositivo '{device}', pero no fue asignado."
 
-        return True, None
+        return None, None
 
     def schedule_event(self, event: Event):
-        occurrences = event.generate_recurrence_occurrences()
-        for occ in occurrences:
-            ok, msg = self.validate_event(occ)
-            if not ok:
-                return False, msg
-        self.scheduled_events.extend(occurrences)
-        return True, f"Evento '{event.event_title}' agregado con {len(occurrences)} ocurrencias."
-        
-    
+        ok, msg = self._admit(event)
+        if not ok:
+            return False, msg
+        return True, self._commit(event)
+
+    def _admit(self, event: Event):
+        #Validacion de schedule_event (evento suelto o serie completa), sin agregar nada
+        if event.recurrence_rule() is None:
+            return self.validate_event(event)
+        self.stats.count("series_validations")
+        with self.stats.timer("validate_series"):
+            return self._validate_series(event)
+
+    def _commit(self, event: Event):
+        #Agrega un evento ya validado y devuelve el mensaje de schedule_event
+        self.stats.count("events_added")
+        if self.validation_cache is not None:
+            #Su validacion ya no sirve (el evento ocupa ahora esos recursos): se libera el lugar en el cache
+            self.validation_cache.discard(validation_key(event))
+        #Una serie se guarda una sola vez como regla; sus ocurrencias se expanden al consultarlas. Se indexa
+        #antes de registrar: el evento tiene su secuencia antes de aparecer en events_by_id (ver scheduled_events)
+        self._index_event(event)
+        self._register(event)
+        self._notify("add", event=event)
+        rule = event.recurrence_rule()
+        if rule is not None and rule.count is None:
+            return f"Evento '{event.event_title}' agregado como serie sin fin ({rule.frequency})."
+        occurrences = 1 if rule is None else rule.count - len(rule.cancelled)
+        return f"Evento '{event.event_title}' agregado con {occurrences} ocurrencias."
+
+    def schedule_many(self, events, atomic=True):
+        #Agrega un lote de eventos en un solo barrido ordenado por hora de inicio. Cada evento aceptado
+        #entra al indice en el momento, asi los siguientes del lote se validan tambien contra el.
+        #atomic=True: todo o nada. atomic=False: se agregan los que se puedan.
+        #Devuelve (todos_ok, reporte) con un (evento, ok, mensaje) por evento, en el orden recibido
+        events = list(events)
+        report = [None] * len(events)
+        committed = []
+        #Los avisos de cambios se retienen hasta saber si el lote queda o se revierte
+        holding = self._held_changes is None
+        if holding:
+            self._held_changes = []
+        for position in sorted(range(len(events)), key=lambda i: events[i].start_key):
+            event = events[position]
+            ok, msg = self.schedule_event(event)
+            report[position] = (event, ok, msg)
+            if ok:
+                committed.append(event)
+            elif atomic:
+                break
+        all_ok = len(committed) == len(events)
+        rolled_back = atomic and not all_ok
+        if rolled_back:
+            for event in committed:
+                self.remove_event(event)
+            for position, entry in enumerate(report):
+                if entry is None or entry[1]:
+                    report[position] = (events[position], False, "No agregado: el lote se cancelo porque otro evento fue rechazado.")
+        if holding:
+            changes, self._held_changes = self._held_changes, None
+            if not rolled_back:
+                for op, payload in changes:
+                    self._notify(op, **payload)
+        return all_ok, report
+
+    def restore_events(self, events):
+        #Restaura eventos ya validados (snapshot de confianza) sin revisar conflictos: cada linea de tiempo
+        #se ordena una sola vez y la ocupacion de los pools se construye al primer uso
+        grouped = {}
+        singles = []
+        for event in events:
+            sequence = next(self._sequence_counter)
+            self._event_sequence[id(event)] = sequence
+            self._register(event)
+            is_series = event.recurrence_rule() is not None
+            if is_series:
+                self.series_index[sequence] = event
+            else:
+                singles.append((sequence, event))
+            demand = self._pool_units_needed(event)
+            if demand:
+                self._pool_demand[id(event)] = demand
+            for rid in set(event.resource_ids).union(demand):
+                if is_series:
+                    self.resource_series.setdefault(rid, {})[sequence] = event
+                    continue
+                grouped.setdefault(rid, []).append((sequence, event))
+                occupancy = self.pool_occupancy.get(rid)
+                if occupancy is not None:
+                    occupancy.add_deferred(event.start_key, event.end_key, demand.get(rid, 0))
+        for rid, entries in grouped.items():
+            timeline = self.resource_timelines.get(rid)
+            if timeline is None:
+                timeline = self.resource_timelines[rid] = ResourceTimeline()
+            timeline.extend(entries)
+        self.event_timeline.extend(singles)
+        self._availability = None
+        if self.validation_cache is not None:
+            self.validation_cache.clear()
+
+    def remove_event(self, event: Event, scope="this"):
+        #Quitar una ocurrencia solo la cancela dentro de su serie ("this"), "following" corta la serie desde esa
+        #ocurrencia y "series" la borra completa, igual que quitar la serie misma
+        master = event.series
+        if master is not None:
+            if not self.is_scheduled(master):
+                return
+            if scope == "series":
+                self.remove_event(master)
+                return
+            index = event.occurrence_index
+            if scope == "following":
+                master.truncate_series(index)
+                self._refresh_availability(master, event.start_key)
+                self._notify("truncate", event=master, count=index)
+            else:
+                master.cancel_occurrence(index)
+                self._refresh_availability(master, event.start_key, event.end_key)
+                self._notify("cancel", event=master, index=index)
+            if master.recurrence_rule().first_active_index() is None:
+                self.remove_event(master)
+            return
+        if not self.is_scheduled(event):
+            return
+        self._unregister(event)
+        self._unindex_event(event)
+        self._notify("remove", event=event)
+
+    def update_event(self, event: Event, changes, scope="this"):
+        #Cambia titulo, horario, recursos o metadatos (changes: "title", "start", "end", "resources", "metadata").
+        #start/end son los nuevos horarios del evento elegido; en una serie se aplican como desplazamiento.
+        #Sobre una ocurrencia, "this" la cancela en la serie y la deja como evento suelto, "following" corta la
+        #serie ahi y sigue con una serie nueva desde esa ocurrencia, y "series" cambia la serie completa.
+        #Todo o nada: si el resultado no es valido el planner queda como estaba. Devuelve (ok, mensaje)
+        if scope not in SCOPES:
+            raise ValueError(f"Alcance invalido: '{scope}'")
+        master = event.series
+        if master is not None and scope == "following":
+            rule = master.recurrence_rule()
+            if event.occurrence_index <= rule.first_active_index():
+                scope = "series"
+        if master is None or scope == "series":
+            old = master or event
+            new = self._edited(old, event, changes, old.recurrence_pattern)
+            if new is None:
+                return False, "El tiempo de finalizacion debe ser despues del de inicio"
+            new.event_id = old.event_id
+            sequence = self._event_sequence[id(old)]
+            return self._replace(lambda: self.remove_event(old), new, lambda: self._reinstate(old, sequence))
+
+        if scope == "this":
+            pattern = None
+        else:
+            rule = master.recurrence_rule()
+            index = event.occurrence_index
+            pattern = {key: value for key, value in master.recurrence_pattern.items() if key != "cancelled"}
+            if rule.count is not None:
+                pattern["count"] = rule.count - index
+            cancelled = sorted(i - index for i in rule.cancelled if i > index)
+            if cancelled:
+                pattern["cancelled"] = cancelled
+        new = self._edited(event, event, changes, pattern)
+        if new is None:
+            return False, "El tiempo de finalizacion debe ser despues del de inicio"
+        saved = dict(master.recurrence_pattern)
+        sequence = self._event_sequence[id(master)]
+
+        def undo():
+            master.recurrence_pattern.clear()
+            master.recurrence_pattern.update(saved)
+            master._rule = None
+            if not self.is_scheduled(master):
+                self._reinstate(master, sequence)
+            else:
+                self._refresh_availability(master)
+        return self._replace(lambda: self.remove_event(event, scope), new, undo)
+
+    def _edited(self, template: Event, selected: Event, changes, pattern):
+        #Copia de template con los cambios; None si el horario resultante no es valido
+        start_key, end_key = template.start_key, template.end_key
+        if changes.get("start") is not None:
+            start_key += to_epoch_seconds(changes["start"]) - selected.start_key
+        if changes.get("end") is not None:
+            end_key += to_epoch_seconds(changes["end"]) - selected.end_key
+        if end_key <= start_key:
+            return None
+        title = changes.get("title") or (selected.series or selected).event_title
+        if changes.get("resources") is not None:
+            ids = tuple(resource_id(name) for name in changes["resources"])
+            mask = resource_mask(changes["resources"])
+        else:
+            ids, mask = template.resource_ids, template.resource_mask
+        metadata = dict((selected.series or selected).event_metadata)
+        metadata.update(changes.get("metadata") or {})
+        return Event.from_keys(title, start_key, end_key, ids, mask, metadata, dict(pattern) if pattern else None, template.status)
+
+    def _replace(self, shrink, new: Event, undo):
+        #shrink quita (o acorta) lo que se reemplaza y luego se agenda new; si new no es valido se deshace todo
+        #y no se avisa ningun cambio a los listeners
+        holding = self._held_changes is None
+        if holding:
+            self._held_changes = []
+        mark = len(self._held_changes)
+        shrink()
+        ok, msg = self.schedule_event(new)
+        if not ok:
+            undo()
+            del self._held_changes[mark:]
+        if holding:
+            changes, self._held_changes = self._held_changes, None
+            for op, payload in changes:
+                self._notify(op, **payload)
+        return ok, msg
+
+    def _reinstate(self, event: Event, sequence):
+        #Vuelve a agregar un evento quitado con su secuencia original (mismo orden que antes de quitarlo)
+        self._index_event(event, sequence)
+        self._register(event)
+
+    def is_scheduled(self, event: Event):
+        return self.events_by_id.get(event.event_id) is event
+
+    def update_event_status(self, event: Event, status: str):
+        #Las ocurrencias comparten los metadatos de su serie, asi que el estado aplica a toda la serie
+        master = event.series or event
+        master.event_metadata["status"] = status
+        if self.is_scheduled(master):
+            self._reindex(master)
+        self._notify("status", event=master, status=status)
+
+    @property
+    def scheduled_events(self):
+        #En orden de alta; un evento reincorporado por _reinstate recupera su lugar. La lista se comparte entre
+        #lecturas hasta el proximo cambio: no se debe modificar
+        stamp = self._events_stamp
+        view = self._scheduled_view
+        if view is None or view[0] != stamp:
+            #Un evento quitado mientras se ordena ya no tiene secuencia; esa vista nace vencida
+            view = self._scheduled_view = (stamp, sorted(self.events_by_id.values(), key=lambda ev: self._event_sequence.get(id(ev), -1)))
+        return view[1]
+
+    def assign_event_ids(self, events):
+        #Da ids, en el orden recibido, a los eventos que aun no tienen (por ejemplo al cargar archivos antiguos)
+        for event in events:
+            if event.event_id is None:
+                event.event_id = self._next_event_id
+                self._next_event_id += 1
+
+    def get_event(self, ref):
+        #ref: id de un evento o serie (12 o "12"), o "12#3" para la tercera ocurrencia de la serie 12
+        event_id, separator, number = str(ref).strip().partition("#")
+        try:
+            event = self.events_by_id.get(int(event_id))
+            index = int(number) - 1 if separator else None
+        except ValueError:
+            return None
+        if event is None or index is None:
+            return event
+        rule = event.recurrence_rule()
+        if rule is None or not rule.is_active(index):
+            return None
+        return event.occurrence(index)
+
+    def find_events(self, title=None, client=None, status=None):
+        #Eventos y series que cumplen todos los filtros dados; se recorre solo el indice mas chico
+        buckets = [self.events_by_field[field].get(value, {})
+                   for field, value in zip(INDEXED_FIELDS, (title, client, status)) if value is not None]
+        if not buckets:
+            return self.scheduled_events
+        smallest = min(buckets, key=len)
+        return [ev for event_id, ev in smallest.items() if all(event_id in bucket for bucket in buckets)]
+
+    def _field_values(self, event: Event):
+        return event.event_title, event.event_metadata.get("client", ""), event.event_metadata.get("status", "pendiente")
+
+    def _register(self, event: Event):
+        #Asigna el id (si no tiene o ya lo usa otro evento) y agrega el evento a los indices hash
+        if event.event_id is None or event.event_id in self.events_by_id:
+            event.event_id = self._next_event_id
+        self._next_event_id = max(self._next_event_id, event.event_id + 1)
+        self.events_by_id[event.event_id] = event
+        self._events_stamp += 1
+        values = self._indexed_as[event.event_id] = self._field_values(event)
+        for field, value in zip(INDEXED_FIELDS, values):
+            self.events_by_field[field].setdefault(value, {})[event.event_id] = event
+
+    def _unregister(self, event: Event):
+        del self.events_by_id[event.event_id]
+        self._events_stamp += 1
+        for field, value in zip(INDEXED_FIELDS, self._indexed_as.pop(event.event_id)):
+            self._drop_from_index(field, value, event.event_id)
+
+    def _reindex(self, event: Event):
+        #Mueve el evento solo en los indices de los campos que cambiaron
+        before = self._indexed_as[event.event_id]
+        after = self._indexed_as[event.event_id] = self._field_values(event)
+        for field, old, new in zip(INDEXED_FIELDS, before, after):
+            if old != new:
+                self._drop_from_index(field, old, event.event_id)
+                self.events_by_field[field].setdefault(new, {})[event.event_id] = event
+
+    def _drop_from_index(self, field, value, event_id):
+        bucket = self.events_by_field[field][value]
+        del bucket[event_id]
+        if not bucket:
+            del self.events_by_field[field][value]
+
+    def clear_events(self):
+        self.events_by_id = {}
+        self._events_stamp += 1
+        self.events_by_field = {field: {} for field in INDEXED_FIELDS}
+        self._indexed_as = {}
+        self.event_timeline = ResourceTimeline()
+        self.series_index = {}
+        self.resource_timelines = {}
+        self.resource_series = {}
+        self.pool_occupancy = {}
+        self._pool_demand = {}
+        self._availability = None
+        if self.validation_cache is not None:
+            self.validation_cache.clear()
+        self._event_sequence = {}
+
+    def clear_resources(self):
+        #Quita recursos, pools y restricciones (sin avisar a los listeners); la usan las cargas de storage
+        self.available_resources = {}
+        self.resource_restrictions = {"corequisite": [], "exclusion": []}
+        self.resource_pools = {}
+        self.pool_occupancy = {}
+        self._constraints = None
+
+    def clear(self):
+        #Borra eventos, recursos, pools y restricciones. El catalogo de trabajos no es parte del estado guardado
+        #(no va al snapshot ni al journal): se conserva, asi reaplicar un clear no deja al planner sin catalogo
+        self.clear_events()
+        self.clear_resources()
+        self._notify("clear")
+
+    # --- Indice por recurso ---
+    def _index_event(self, event: Event, sequence=None):
+        if sequence is None:
+            sequence = next(self._sequence_counter)
+        self._event_sequence[id(event)] = sequence
+        is_series = event.recurrence_rule() is not None
+        if is_series:
+            self.series_index[sequence] = event
+        else:
+            self.event_timeline.add(event, sequence)
+        demand = self._pool_units_needed(event)
+        if demand:
+            self._pool_demand[id(event)] = demand
+        for rid in set(event.resource_ids).union(demand):
+            if is_series:
+                self.resource_series.setdefault(rid, {})[sequence] = event
+                continue
+            timeline = self.resource_timelines.get(rid)
+            if timeline is None:
+                timeline = self.resource_timelines[rid] = ResourceTimeline()
+            timeline.add(event, sequence)
+            occupancy = self.pool_occupancy.get(rid)
+            if occupancy is not None:
+                occupancy.add(event.start_key, event.end_key, demand.get(rid, 0))
+        if self._availability is not None:
+            self._mark_availability(event)
+        self._touch(event)
+
+    def _touch(self, event: Event):
+        #Despues de cambiar la agenda de los recursos de event: vence las validaciones en cache que los leyeron
+        stamp = self._change_stamp + 1
+        for rid in self._indexed_rids(event):
+            self._resource_stamps[rid] = stamp
+        self._change_stamp = stamp
+
+    def _indexed_rids(self, event: Event):
+        #Recursos en cuyos indices esta (o estaria) el evento: los que lista y los pools que pide su trabajo
+        return set(event.resource_ids).union(self._pool_demand.get(id(event), ()))
+
+    def _units(self, event: Event, rid: int):
+        #Unidades del pool rid que ocupa un evento agendado
+        demand = self._pool_demand.get(id(event))
+        if demand is not None and rid in demand:
+            return demand[rid]
+        return event.units_of(rid)
+
+    def _unindex_event(self, event: Event):
+        sequence = self._event_sequence.pop(id(event), None)
+        if sequence is None:
+            return
+        is_series = event.recurrence_rule() is not None
+        if is_series:
+            self.series_index.pop(sequence, None)
+        else:
+            self.event_timeline.remove(event, sequence)
+        for rid in self._indexed_rids(event):
+            if is_series:
+                self.resource_series.get(rid, {}).pop(sequence, None)
+                continue
+            timeline = self.resource_timelines.get(rid)
+            if timeline is not None:
+                timeline.remove(event, sequence)
+            occupancy = self.pool_occupancy.get(rid)
+            if occupancy is not None:
+                occupancy.remove(event.start_key, event.end_key, self._units(event, rid))
+        self._refresh_availability(event)
+        self._pool_demand.pop(id(event), None)
+
+    def _build_pool_occupancy(self, rid: int):
+        occupancy = self.pool_occupancy[rid] = PoolOccupancy()
+        timeline = self.resource_timelines.get(rid)
+        if timeline is not None:
+            for ev in timeline.events():
+                occupancy.add(ev.start_key, ev.end_key, self._units(ev, rid))
+
+    def _series_overlapping(self, rid: int, start_key, end_key):
+        #Ocurrencias (no canceladas) de las series del recurso que se solapan con [start_key, end_key)
+        for sequence, master in self.resource_series.get(rid, {}).items():
+            for index in master.recurrence_rule().indices_between(start_key, end_key):
+                yield sequence, master, index
+
+    def _pool_profile(self, rid: int, start_key, end_key):
+        #Tramos (inicio, fin, unidades en uso) de [start_key, end_key): el arbol de ocupacion cubre los
+        #eventos sueltos y se le suman las ocurrencias de series, que solo se expanden dentro del intervalo
+        occupancy = self.pool_occupancy.get(rid)
+        return [(seg_start, seg_end, booked + (occupancy.max_in_use(seg_start, seg_end) if occupancy else 0))
+                for seg_start, seg_end, booked in self._series_profile(rid, start_key, end_key)]
+
+    def _series_profile(self, rid: int, start_key, end_key):
+        #Tramos (inicio, fin, unidades de series) de [start_key, end_key), cortados en los bordes de las
+        #ocurrencias: dentro de cada tramo las unidades de las series son constantes
+        bookings = []
+        for sequence, master, index in self._series_overlapping(rid, start_key, end_key):
+            rule = master.recurrence_rule()
+            occ_start = rule.occurrence_start(index)
+            bookings.append((max(occ_start, start_key), min(occ_start + rule.duration, end_key), self._units(master, rid)))
+        cuts = sorted({start_key, end_key}.union(*((b[0], b[1]) for b in bookings)))
+        return [(seg_start, seg_end, sum(units for b_start, b_end, units in bookings if b_start <= seg_start and seg_end <= b_end))
+                for seg_start, seg_end in zip(cuts, cuts[1:])]
+
+    def _units_in_use(self, rid: int, start_key, end_key):
+        if not self.resource_series.get(rid):
+            occupancy = self.pool_occupancy.get(rid)
+            return occupancy.max_in_use(start_key, end_key) if occupancy else 0
+        return max(used for seg_start, seg_end, used in self._pool_profile(rid, start_key, end_key))
+
+    def _units_free(self, rid: int, start_key, end_key):
+        return self.resource_pools.get(resource_name(rid), 0) - self._units_in_use(rid, start_key, end_key)
+
+    def pool_units_in_use(self, pool: str, start_time, end_time):
+        return self._units_in_use(resource_id(pool), to_epoch_seconds(start_time), to_epoch_seconds(end_time))
+
+    def pool_units_free(self, pool: str, start_time, end_time):
+        return self.resource_pools.get(pool, 0) - self.pool_units_in_use(pool, start_time, end_time)
+
+    # --- Disponibilidad por franjas ---
+    def free_resources(self, start_time, end_time, skill=None):
+        #Recursos exclusivos libres durante todo [start_time, end_time) (con skill, solo los que la tienen) y
+        #unidades libres de cada pool. La matriz resuelve casi todo con un AND por recurso: fila sin bits en el
+        #rango => libre; bits en franjas enteras del rango => ocupado; solo si toca las franjas de los bordes
+        #se revisa el recurso en su linea de tiempo. Devuelve (nombres, {pool: unidades libres})
+        start_key, end_key = to_epoch_seconds(start_time), to_epoch_seconds(end_time)
+        rules = self._rules()
+        candidates = rules.known_mask & ~rules.pool_mask
+        if skill is not None:
+            candidates &= rules.skill_masks.get(skill, 0)
+        matrix = self._availability_for(start_key, end_key)
+        if matrix is not None:
+            lo, hi = matrix.span(start_key, end_key)
+            window = matrix.mask(lo, hi)
+            inner_lo = lo + (matrix.slot_start(lo) < start_key)
+            inner_hi = hi - (matrix.slot_start(hi) > end_key)
+            inner = matrix.mask(inner_lo, inner_hi) if inner_lo < inner_hi else 0
+        free = []
+        for name, res in self.available_resources.items():
+            rid = res.resource_id
+            if not candidates >> rid & 1:
+                continue
+            if matrix is not None:
+                row = matrix.row(rid)
+                if not row & window:
+                    free.append(name)
+                    continue
+                if row & inner:
+                    continue
+            if self._resource_earliest_free(rid, start_key, end_key - start_key, end_key) == start_key:
+                free.append(name)
+        pools = {pool: self._units_free(resource_id(pool), start_key, end_key) for pool in self.resource_pools}
+        return free, pools
+
+    def common_free_windows(self, resource_names, start_time, end_time, min_duration=timedelta(0)):
+        #Ventanas dentro de [start_time, end_time) en las que todos los recursos (exclusivos) estan libres a la
+        #vez: los tramos en 0 del OR de sus filas. Precision de AVAILABILITY_SLOT (una franja con cualquier
+        #reserva cuenta como ocupada) y hasta AVAILABILITY_HORIZON desde el dia de start_time.
+        #Devuelve una lista de (desde, hasta)
+        start_key, end_key = to_epoch_seconds(start_time), to_epoch_seconds(end_time)
+        end_key = min(end_key, self._availability_origin(start_key) + int(AVAILABILITY_HORIZON.total_seconds()))
+        if end_key <= start_key:
+            return []
+        matrix = self._availability_for(start_key, end_key)
+        busy = 0
+        for name in resource_names:
+            busy |= matrix.row(resource_id(name))
+        min_seconds = int(min_duration.total_seconds())
+        windows = []
+        for first, last in matrix.free_runs(busy, *matrix.span(start_key, end_key)):
+            window_start, window_end = max(matrix.slot_start(first), start_key), min(matrix.slot_start(last), end_key)
+            if window_end - window_start >= max(min_seconds, 1):
+                windows.append((from_epoch_seconds(window_start), from_epoch_seconds(window_end)))
+        return windows
+
+    def _availability_origin(self, key):
+        #La matriz empieza a la medianoche del dia consultado
+        return key - key % 86400
+
+    def _availability_for(self, start_key, end_key):
+        #Matriz que cubre [start_key, end_key). Si el rango se sale de la actual se arma otra desde el dia de
+        #start_key (horizonte movil); None si el rango es mas largo que AVAILABILITY_HORIZON
+        matrix = self._availability
+        if matrix is not None and matrix.covers(start_key, end_key):
+            return matrix
+        slot = int(AVAILABILITY_SLOT.total_seconds())
+        slots = int(AVAILABILITY_HORIZON.total_seconds()) // slot
+        origin = self._availability_origin(start_key)
+        if end_key > origin + slot * slots:
+            return None
+        self.stats.count("availability_builds")
+        matrix = self._availability = AvailabilityMatrix(origin, slot, slots)
+        for rid, timeline in self.resource_timelines.items():
+            for ev in timeline.iter_overlapping(matrix.origin, matrix.end):
+                matrix.mark(rid, ev.start_key, ev.end_key)
+        for rid, series in self.resource_series.items():
+            for master in series.values():
+                self._mark_series(matrix, rid, master, matrix.origin, matrix.end)
+        return matrix
+
+    def _mark_series(self, matrix, rid: int, master: Event, start_key, end_key):
+        rule = master.recurrence_rule()
+        for index in rule.indices_between(start_key, end_key):
+            occ_start = rule.occurrence_start(index)
+            matrix.mark(rid, occ_start, occ_start + rule.duration)
+
+    def _mark_availability(self, event: Event):
+        matrix = self._availability
+        is_series = event.recurrence_rule() is not None
+        for rid in self._indexed_rids(event):
+            if is_series:
+                self._mark_series(matrix, rid, event, matrix.origin, matrix.end)
+            else:
+                matrix.mark(rid, event.start_key, event.end_key)
+
+    def _refresh_availability(self, event: Event, start_key=None, end_key=None):
+        #Vuelve a calcular, con lo que queda agendado, las franjas de los recursos de event en [start_key, end_key)
+        #(por defecto todo lo que ocupaba). Se usa al quitar eventos y al cancelar o cortar ocurrencias de series
+        self._touch(event)
+        matrix = self._availability
+        if matrix is None:
+            return
+        if start_key is None:
+            rule = event.recurrence_rule()
+            start_key, end_key = (event.start_key, event.end_key) if rule is None else (rule.start_key, rule.end_key)
+        lo, hi = matrix.span(start_key, matrix.end if end_key is None else end_key)
+        if lo >= hi:
+            return
+        lo_key, hi_key = matrix.slot_start(lo), matrix.slot_start(hi)
+        for rid in self._indexed_rids(event):
+            matrix.clear(rid, lo, hi)
+            timeline = self.resource_timelines.get(rid)
+            if timeline is not None:
+                for ev in timeline.iter_overlapping(lo_key, hi_key):
+                    matrix.mark(rid, ev.start_key, ev.end_key)
+            for master in self.resource_series.get(rid, {}).values():
+                self._mark_series(matrix, rid, master, lo_key, hi_key)
+
+    def _first_resource_conflict(self, new_event: Event):
+        #Se reporta el evento existente mas antiguo (orden de alta) con el que choca,
+        #y el primer recurso del nuevo evento ocupado por el, igual que el recorrido lineal original.
+        #Un pool solo choca cuando ya no le quedan unidades libres para este evento
+        start_key, end_key = new_event.start_key, new_event.end_key
+        pool_mask = self._rules().pool_mask
+        conflicts = {}
+        demand = None
+        for rid in set(new_event.resource_ids):
+            timeline = self.resource_timelines.get(rid)
+            series = self.resource_series.get(rid)
+            if timeline is None and not series:
+                continue
+            if pool_mask >> rid & 1:
+                if demand is None:
+                    demand = self._pool_units_needed(new_event)
+                if self._units_free(rid, start_key, end_key) >= demand[rid]:
+                    continue
+            #Cada evento existente acumula la mascara de los recursos que le ocupa al nuevo
+            if timeline is not None:
+                if self.stats.enabled:
+                    self.stats.count("events_scanned", timeline.count_overlapping(start_key, end_key))
+                for sequence, existing in timeline.overlapping(start_key, end_key):
+                    conflicts.setdefault(sequence, [existing, 0])[1] |= 1 << rid
+            for sequence, master, index in self._series_overlapping(rid, start_key, end_key):
+                entry = conflicts.setdefault(sequence, [master, 0])
+                if entry[0] is master:
+                    entry[0] = master.occurrence(index)
+                entry[1] |= 1 << rid
+        if not conflicts:
+            return None
+        existing, busy_mask = conflicts[min(conflicts)]
+        for rid in new_event.resource_ids:
+            if busy_mask >> rid & 1:
+                return resource_name(rid), existing
+        return None
+
+    def _validate_series(self, master: Event):
+        #Valida una serie completa sin expandirla: la primera ocurrencia pasa por validate_event (recursos,
+        #restricciones y catalogo no dependen del horario) y luego se busca aritmeticamente la primera
+        #ocurrencia que choca con eventos sueltos u otras series; el mensaje es el de esa ocurrencia
+        rule = master.recurrence_rule()
+        first_index = rule.first_active_index()
+        if first_index is None:
+            return True, None
+        ok, msg = self.validate_event(master.occurrence(first_index))
+        if not ok:
+            return False, msg
+        clash = None
+        #Los pools que pide su trabajo del catalogo se revisan en cada ocurrencia aunque la serie no los liste
+        demand = self._pool_units_needed(master)
+        for rid in set(master.resource_ids).union(demand):
+            if rid in demand:
+                index = self._first_pool_overflow(rid, master, demand[rid], clash)
+            else:
+                index = self._first_exclusive_clash(rid, master)
+            if index is not None and (clash is None or index < clash):
+                clash = index
+        if clash is None:
+            return True, None
+        return self.validate_event(master.occurrence(clash))
+
+    def _first_exclusive_clash(self, rid: int, master: Event):
+        rule = master.recurrence_rule()
+        found = None
+        timeline = self.resource_timelines.get(rid)
+        if timeline is not None:
+            span_end = rule.end_key
+            if rule.count is not None and rule.count <= timeline.count_overlapping(rule.start_key, span_end):
+                #Pocas ocurrencias: se consulta el indice una vez por ocurrencia
+                for index in rule.indices_between(rule.start_key, span_end):
+                    start = rule.occurrence_start(index)
+                    if next(timeline.overlapping(start, start + rule.duration), None) is not None:
+                        found = index
+                        break
+            else:
+                #Pocos eventos sueltos en el tramo de la serie: se calcula que ocurrencia toca cada uno
+                for sequence, existing in timeline.overlapping(rule.start_key, span_end):
+                    if found is not None and existing.start_key >= rule.occurrence_start(found) + rule.duration:
+                        break
+                    index = rule.first_index_between(existing.start_key, existing.end_key)
+                    if index is not None and (found is None or index < found):
+                        found = index
+        for sequence, other in self.resource_series.get(rid, {}).items():
+            index = rule.first_conflict_index(other.recurrence_rule())
+            if index is not None and (found is None or index < found):
+                found = index
+        return found
+
+    def _first_pool_overflow(self, rid: int, master: Event, needed, before=None):
+        #Revisa la ocupacion del pool en cada ocurrencia. Para una serie sin fin basta llegar hasta que
+        #terminan los eventos sueltos y las cancelaciones de las otras series, mas un periodo comun (mcm)
+        rule = master.recurrence_rule()
+        capacity = self.resource_pools.get(resource_name(rid), 0)
+        horizon = rule.end_key
+        if horizon is None:
+            horizon = self._pool_periodic_horizon(rid, rule)
+        if before is not None:
+            horizon = min(horizon, rule.occurrence_start(before))
+        for index in rule.indices_between(rule.start_key, horizon):
+            start = rule.occurrence_start(index)
+            if capacity - self._units_in_use(rid, start, start + rule.duration) < needed:
+                return index
+        return None
+
+    def _pool_periodic_horizon(self, rid: int, rule):
+        horizon = rule._last_cancelled_end()
+        period = rule.step
+        timeline = self.resource_timelines.get(rid)
+        if timeline is not None and len(timeline):
+            horizon = max(horizon, max(ev.end_key for ev in timeline.events()))
+        for sequence, other in self.resource_series.get(rid, {}).items():
+            other_rule = other.recurrence_rule()
+            horizon = max(horizon, other_rule.start_key, other_rule._last_cancelled_end())
+            period = lcm(period, other_rule.step)
+        return horizon + period + rule.duration
+
     def list_scheduled_events(self):
-        return sorted(self.scheduled_events, key=lambda e: e.start_time)
-    
+        return self.events_between()
+
+    def events_between(self, start_time=None, end_time=None):
+        #Eventos (con las ocurrencias de las series) que se solapan con [start_time, end_time), ordenados por inicio.
+        #Sin limites es la lista completa; con limites solo se recorre ese tramo de la linea de tiempo
+        return self._window(self.event_timeline, self.series_index, start_time, end_time)
+
+    def agenda(self, resource_name: str, start_time=None, end_time=None):
+        rid = resource_id(resource_name)
+        return self._window(self.resource_timelines.get(rid), self.resource_series.get(rid, {}), start_time, end_time)
+
+    def iter_bookings(self, resource_name=None, start_time=None, end_time=None):
+        #Para exportar: genera sin armar listas los eventos sueltos del rango (de todo el taller o de un recurso)
+        #en orden de inicio y despues cada serie con alguna ocurrencia en el rango, una sola vez y sin expandir
+        if resource_name is None:
+            timeline, series = self.event_timeline, self.series_index
+        else:
+            rid = resource_id(resource_name)
+            timeline, series = self.resource_timelines.get(rid), self.resource_series.get(rid, {})
+        start_key = -TIME_OFFSET if start_time is None else to_epoch_seconds(start_time)
+        end_key = None if end_time is None else to_epoch_seconds(end_time)
+        if timeline is not None:
+            yield from timeline.iter_overlapping(start_key, end_key)
+        for master in list(series.values()):
+            rule = master.recurrence_rule()
+            if end_key is None and rule.count is None:
+                yield master
+            elif rule.first_index_between(start_key, rule.end_key if end_key is None else end_key) is not None:
+                yield master
+
+    def _window(self, timeline, series, start_time, end_time):
+        #El tramo de la linea de tiempo ya viene ordenado; solo se agregan las ocurrencias de las series y
+        #sort (timsort) las intercala con ese tramo. La clave (inicio, secuencia) desempata por orden de alta
+        start_key = -TIME_OFFSET if start_time is None else to_epoch_seconds(start_time)
+        end_key = None if end_time is None else to_epoch_seconds(end_time)
+        entries = []
+        if timeline is not None:
+            entries = [(ev.start_key, sequence, ev) for sequence, ev in timeline.overlapping(start_key, end_key)]
+        if not series:
+            return [entry[2] for entry in entries]
+        for sequence, master in series.items():
+            entries.extend(self._occurrences(sequence, master, start_key, end_key))
+        entries.sort(key=lambda entry: entry[:2])
+        return [entry[2] for entry in entries]
+
+    def _occurrences(self, sequence, master: Event, start_key, end_key):
+        rule = master.recurrence_rule()
+        if rule.count is None and end_key is None:
+            #Las series sin fin se muestran hasta OPEN_SERIES_HORIZON a partir de hoy
+            end_key = to_epoch_seconds(max(datetime.now(), from_epoch_seconds(rule.start_key)) + OPEN_SERIES_HORIZON)
+        for index in rule.indices_between(start_key, end_key):
+            yield rule.occurrence_start(index), sequence, master.occurrence(index)
+
     def get_event_by_title(self, title: str):
-        for ev in self.scheduled_events:
-            if ev.event_title == title:
-                return ev
+        titled = self.events_by_field["title"]
+        if title in titled:
+            return next(iter(titled[title].values()))
+        #Titulos de ocurrencias: "<titulo de la serie> (#n)"
+        match = OCCURRENCE_TITLE.match(title)
+        if match:
+            index = int(match.group(2)) - 1
+            for ev in titled.get(match.group(1), {}).values():
+                rule = ev.recurrence_rule()
+                if rule is not None and rule.is_active(index):
+                    return ev.occurrence(index)
         return None    
     
     def get_schedule_for_resource(self, resource_name: str):
-        return sorted([ev for ev in self.scheduled_events if resource_name in ev.required_resources], key=lambda e: e.start_time)
+        return self.agenda(resource_name)
     
     def find_next_available_slot(self, template_event: Event, search_from_dt):
-        step = timedelta(minutes=30)
-        duration = template_event.end_time - template_event.start_time
-        attempts = 0
-        while attempts < 5000:
-            candidate_start = search_from_dt + attempts * step
-            candidate_end = candidate_start + duration
-            candidate = Event(
-                template_event.event_title,
-                candidate_start,
-                candidate_end,
-                template_event.required_resources,
-                template_event.event_metadata,
-                None
-            )
+        slots = self.find_available_slots(template_event, search_from_dt, limit=1)
+        return slots[0] if slots else (None, None)
+
+    def find_available_slots(self, template_event: Event, search_from_dt, limit=1, search_until=None):
+        #Recorre directamente los huecos de los recursos pedidos: cada recurso adelanta el candidato
+        #hasta su siguiente hueco libre y se repite hasta que todos coinciden (punto fijo).
+        #Devuelve hasta 'limit' huecos consecutivos (limit=None => todos los que caben antes de search_until)
+        self.stats.count("slot_searches")
+        with self.stats.timer("find_available_slots"):
+            duration = template_event.end_key - template_event.start_key
+            if search_until is None:
+                search_until = search_from_dt + SLOT_SEARCH_HORIZON
+            until_key = to_epoch_seconds(search_until)
+            pool_units = self._pool_units_needed(template_event)
+            exclusive = [rid for rid in set(template_event.resource_ids) if rid not in pool_units]
+
+            slots = []
+            candidate_start = to_epoch_seconds(search_from_dt)
+            while limit is None or len(slots) < limit:
+                candidate_start = self._next_common_gap(candidate_start, duration, exclusive, pool_units, until_key)
+                if candidate_start is None:
+                    break
+                candidate = Event.from_keys(
+                    template_event.event_title,
+                    candidate_start,
+                    candidate_start + duration,
+                    template_event.resource_ids,
+                    template_event.resource_mask,
+                    template_event.event_metadata,
+                    None,
+                    template_event.status
+                )
+                ok, msg = self.validate_event(candidate)
+                if not ok:
+                    #Solo fallan aqui reglas que no dependen del horario (recursos, restricciones, catalogo)
+                    break
+                slots.append((candidate.start_time, candidate.end_time))
+                candidate_start = candidate.end_key
+            return slots
+
+    def _job_requirements(self, event: Event):
+        #Requisitos del catalogo para el trabajo del evento; las ocurrencias ("Titulo (#n)") usan los de su serie
+        return self.job_catalog.get((event.series or event).event_title)
+
+    def _pool_units_needed(self, event: Event):
+        #id del pool -> unidades que necesita el evento
+        units = {}
+        pool_mask = self._rules().pool_mask
+        for rid in event.resource_ids:
+            if pool_mask >> rid & 1:
+                units[rid] = units.get(rid, 0) + 1
+        job_requirements = self._job_requirements(event) or {}
+        for pool, qty in job_requirements.get("pools", {}).items():
+            rid = resource_id(pool)
+            units[rid] = max(units.get(rid, 0), qty)
+        return units
+
+    def _next_common_gap(self, candidate_start, duration, exclusive, pool_units, search_until, pool_memo=None):
+        #pool_memo (opcional): id del pool -> [(desde, hueco)] ya calculados; cualquier busqueda que arranque
+        #en [desde, hueco] termina en ese mismo hueco, asi varias busquedas con los mismos pools no repiten trabajo
+        while candidate_start + duration <= search_until:
+            self.stats.count("slot_attempts")
+            moved = False
+            for rid in exclusive:
+                free_at = self._resource_earliest_free(rid, candidate_start, duration, search_until)
+                if free_at != candidate_start:
+                    candidate_start, moved = free_at, True
+            for rid, units in pool_units.items():
+                known = pool_memo.setdefault((rid, units), []) if pool_memo is not None else None
+                free_at = next((gap for since, gap in known if since <= candidate_start <= gap), None) if known else None
+                if free_at is None:
+                    free_at = self._pool_earliest_free(rid, candidate_start, duration, units, search_until)
+                    if free_at is None:
+                        return None
+                    if known is not None:
+                        known.append((candidate_start, free_at))
+                if free_at != candidate_start:
+                    candidate_start, moved = free_at, True
+            if not moved:
+                return candidate_start
+        return None
+
+    def _resource_earliest_free(self, rid: int, start_key, duration, search_until):
+        timeline = self.resource_timelines.get(rid)
+        while start_key + duration <= search_until:
+            if timeline is not None:
+                start_key = timeline.earliest_free(start_key, duration)
+            busy_until = None
+            for sequence, master, index in self._series_overlapping(rid, start_key, start_key + duration):
+                rule = master.recurrence_rule()
+                occ_end = rule.occurrence_start(index) + rule.duration
+                if busy_until is None or occ_end > busy_until:
+                    busy_until = occ_end
+            if busy_until is None:
+                return start_key
+            start_key = busy_until
+        return start_key
+
+    def _pool_earliest_free(self, rid: int, start_key, duration, units, search_until):
+        capacity = self.resource_pools.get(resource_name(rid), 0)
+        occupancy = self.pool_occupancy.get(rid)
+        while start_key + duration <= search_until:
+            if occupancy is not None:
+                start_key = occupancy.earliest_free(start_key, duration, capacity, units)
+            elif capacity < units:
+                start_key = None
+            if start_key is None or not self.resource_series.get(rid):
+                return start_key
+            #Se salta justo despues del ultimo instante lleno: en cada tramo las series ocupan 'booked' unidades
+            #fijas y el arbol ubica el ultimo instante en el que los eventos sueltos completan el resto
+            last_full = None
+            for seg_start, seg_end, booked in reversed(self._series_profile(rid, start_key, start_key + duration)):
+                threshold = capacity - units + 1 - booked
+                if threshold <= 0:
+                    last_full = seg_end - 1
+                elif occupancy is not None:
+                    last_full = occupancy.last_at_least(seg_start, seg_end, threshold)
+                if last_full is not None:
+                    break
+            if last_full is None:
+                return start_key
+            start_key = last_full + 1
+        return start_key
+    
+    def auto_assign(self, job_title: str, duration, search_from_dt, search_until=None, event_metadata=None):
+        #Asignacion mas temprana para un trabajo del catalogo: tecnicos que cubran las skills, unidades de los
+        #pools y los dispositivos. Por cada grupo de tecnicos candidato se busca su primer hueco comun en los
+        #indices, acotando la busqueda al mejor inicio encontrado hasta el momento.
+        #Devuelve (evento sin agendar, None) o (None, mensaje)
+        self.stats.count("auto_assign_calls")
+        job_requirements = self.job_catalog.get(job_title)
+        if not job_requirements:
+            return None, f"El trabajo '{job_title}' no esta en el catalogo."
+        duration = int(duration.total_seconds())
+        if duration <= 0:
+            return None, "La duracion debe ser mayor a cero."
+        job = self._rules().job(job_title, job_requirements)
+        for skill, mask in job.skills:
+            if not mask:
+                return None, f"Este trabajo requiere un especialista con la skill: '{skill}' pero no se encontro ninguno."
+        for pool, rid, qty in job.pools:
+            if self.resource_pools.get(pool, 0) < qty:
+                return None, f"Este trabajo necesita {qty} unidad(es) de '{pool}', pero no hay suficientes en el taller."
+        if search_until is None:
+            search_until = search_from_dt + SLOT_SEARCH_HORIZON
+        start_key = to_epoch_seconds(search_from_dt)
+        until_key = to_epoch_seconds(search_until)
+        pools = [rid for pool, rid, qty in job.pools for unit in range(qty)]
+        devices = [resource_id(device) for device, bit in job.devices]
+
+        best = None
+        reason = None
+        pool_memo = {}
+        for staff in self._staff_candidates(job):
+            self.stats.count("auto_assign_candidates")
+            ids = tuple(pools) + staff + tuple(devices)
+            mask = 0
+            for rid in ids:
+                mask |= 1 << rid
+            template = Event.from_keys(job_title, start_key, start_key + duration, ids, mask, event_metadata or {}, None, "pendiente")
+            pool_units = self._pool_units_needed(template)
+            exclusive = [rid for rid in set(ids) if rid not in pool_units]
+            limit = until_key if best is None else min(until_key, best.start_key + duration - 1)
+            found = self._next_common_gap(start_key, duration, exclusive, pool_units, limit, pool_memo)
+            if found is None:
+                continue
+            candidate = Event.from_keys(job_title, found, found + duration, ids, mask, template.event_metadata, None, "pendiente")
             ok, msg = self.validate_event(candidate)
-            if ok:
-                return candidate_start, candidate_end
-            attempts +=1
-        return None, None
+            if not ok:
+                #Restricciones o recursos que no dependen del horario: este grupo nunca sirve
+                reason = msg
+                continue
+            best = candidate
+        if best is None:
+            return None, reason or "No se encontro una asignacion posible en el rango."
+        return best, None
+
+    def _staff_candidates(self, job):
+        #Grupos (tuplas de ids) de tecnicos que cubren todas las skills del trabajo. Si alguien las tiene
+        #todas basta con esa persona; si no, se combina un tecnico por skill
+        if not job.skills:
+            return [()]
+        common = job.skills[0][1]
+        for skill, mask in job.skills[1:]:
+            common &= mask
+        if common:
+            return [(rid,) for rid in mask_ids(common)]
+        groups = {tuple(sorted(set(combo))) for combo in product(*(mask_ids(mask) for skill, mask in job.skills))}
+        return sorted(groups)
     
     def validate_status(self, status: str) -> bool:
         return status in ["pendiente", "en progreso", "completado"]
     
     
-      
\ No newline at end of file
+      
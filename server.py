@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from planner import Planner, SCOPES
+from journal import PlannerJournal
+from concurrency import SharedPlanner
+from batch import parse_rows
+from archive import ShardArchive
+
+#Servidor local para que varios puestos de recepcion agenden en el mismo taller: JSON por lineas sobre TCP
+#(127.0.0.1) o un socket Unix. Cada pedido es un objeto con "op" y opcionalmente "req", que vuelve tal cual
+#en la respuesta para emparejarlas (las respuestas pueden llegar en otro orden):
+#  book {event: {title, start, end, resources, client, notes, status, recurrence, count, until, duration_minutes}}
+#  remove {id, scope}, status {id, status}
+#  list {from, to, offset, limit}, agenda {resource, from, to, offset, limit}, get {id}, free {from, to, skill},
+#  resources, ping
+#Las lecturas se responden apenas llegan, sin esperar a las escrituras: ping y resources en el loop y las
+#que pueden tomar el lock del SharedPlanner en un pool de hilos propio, asi no frenan el loop. Las escrituras
+#que llegan mientras se procesa un lote se juntan en el siguiente; cada lote corre en un pool de hilos sobre un
+#SharedPlanner (las reservas de recursos distintos se validan en paralelo) y se asegura en disco con un solo
+#fsync del journal antes de responder (group commit).
+#Uso: python server.py [--port 8765 | --unix /tmp/taller.sock] [--workers 4]
+
+DEFAULT_PORT = 8765
+#Escrituras que entran como maximo en un lote, e hilos que las procesan
+BATCH_LIMIT = 256
+WORKERS = 4
+#Eventos por respuesta de list/agenda si el pedido no dice otra cosa
+LIST_LIMIT = 100
+READ_OPS = ("list", "agenda", "get", "free", "resources", "ping")
+#Lecturas que nunca toman el lock: se responden en el loop
+LOOP_READS = ("resources", "ping")
+WRITE_OPS = ("book", "remove", "status")
+
+
+class PlannerServer:
+    def __init__(self, shared, journal=None, workers=WORKERS, batch_limit=BATCH_LIMIT):
+        self.shared = shared
+        self.planner = shared.planner
+        self.journal = journal
+        self.batch_limit = batch_limit
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.readers = ThreadPoolExecutor(max_workers=workers)
+        self.served = {"reads": 0, "writes": 0, "batches": 0}
+        self._queue = None
+        self._batcher = None
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, unix_path=None):
+        #Devuelve el asyncio.Server ya escuchando; close() lo detiene
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batches())
+        if unix_path:
+            return await asyncio.start_unix_server(self._client, path=unix_path)
+        return await asyncio.start_server(self._client, host, port)
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, unix_path=None):
+        server = await self.start(host, port, unix_path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        self.executor.shutdown(wait=True)
+        self.readers.shutdown(wait=True)
+
+    async def _client(self, reader, writer):
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("se esperaba un objeto")
+                except ValueError as e:
+                    self._send(writer, {}, {"ok": False, "message": f"JSON invalido: {e}"})
+                    continue
+                task = asyncio.create_task(self._handle(request, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                await writer.drain()
+            if pending:
+                await asyncio.gather(*pending)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, request, writer):
+        op = request.get("op")
+        if op in READ_OPS:
+            self.served["reads"] += 1
+            if op in LOOP_READS:
+                response = self._guarded(self._read, request)
+            else:
+                response = await asyncio.get_running_loop().run_in_executor(self.readers, self._guarded, self._read, request)
+        elif op in WRITE_OPS:
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((request, future))
+            response = await future
+        else:
+            response = {"ok": False, "message": f"Operacion desconocida: '{op}'"}
+        self._send(writer, request, response)
+
+    def _send(self, writer, request, response):
+        if "req" in request:
+            response["req"] = request["req"]
+        if not writer.is_closing():
+            writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    async def _batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_limit and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            responses = await asyncio.gather(*(loop.run_in_executor(self.executor, self._guarded, self._write, request)
+                                               for request, future in batch))
+            if self.journal is not None:
+                #Solo la compactacion cambia el planner (archiva lo vencido); el fsync solo necesita el lock
+                compacts = self.journal.pending >= self.journal.compact_every
+                await loop.run_in_executor(self.executor, self.shared.write if compacts else self.shared.exclusive,
+                                           self.journal.checkpoint)
+            self.served["writes"] += len(batch)
+            self.served["batches"] += 1
+            for (request, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+
+    def _guarded(self, action, request):
+        try:
+            return action(request)
+        except KeyError as e:
+            return {"ok": False, "message": f"Falta el campo {e}"}
+        except (ValueError, TypeError) as e:
+            return {"ok": False, "message": str(e)}
+
+    # --- Escrituras (corren en los hilos del pool) ---
+    def _write(self, request):
+        if request["op"] == "book":
+            return self._book(request.get("event") or {})
+        return self.shared.write(self._change, request)
+
+    def _change(self, request):
+        #remove y status: buscar el evento y cambiarlo en el mismo paso, con el lock del SharedPlanner tomado
+        event = self.planner.get_event(request["id"])
+        if event is None:
+            return {"ok": False, "message": f"No hay un evento con id '{request['id']}'"}
+        if request["op"] == "remove":
+            scope = request.get("scope", "this")
+            if scope not in SCOPES:
+                raise ValueError(f"Alcance invalido: '{scope}'")
+            self.planner.remove_event(event, scope)
+            return {"ok": True, "message": f"Evento '{event.event_title}' eliminado."}
+        status = request["status"]
+        if not self.planner.validate_status(status):
+            return {"ok": False, "message": f"Estado invalido: '{status}'"}
+        self.planner.update_event_status(event, status)
+        return {"ok": True, "message": f"Estado actualizado a '{status}'."}
+
+    def _book(self, row):
+        line, job, error = next(parse_rows([(1, row)]))
+        if job is None:
+            return {"ok": False, "message": error}
+        if isinstance(job, tuple):
+            title, search_from, duration, metadata = job
+            job, error = self.shared.read(self.planner.auto_assign, title, duration, search_from, event_metadata=metadata)
+            if job is None:
+                return {"ok": False, "message": error}
+        ok, msg = self.shared.schedule_event(job)
+        response = {"ok": ok, "message": msg}
+        if ok:
+            response["event"] = event_record(job)
+        return response
+
+    # --- Lecturas (sin lock salvo que un commit se cruce; las de LOOP_READS corren en el loop) ---
+    def _read(self, request):
+        op = request["op"]
+        if op == "ping":
+            return {"ok": True, "version": self.shared.version, **self.served}
+        if op == "resources":
+            return {"ok": True, "resources": list(self.planner.available_resources), "pools": dict(self.planner.resource_pools)}
+        if op == "get":
+            event = self.shared.read(self.planner.get_event, request["id"])
+            if event is None:
+                return {"ok": False, "message": f"No hay un evento con id '{request['id']}'"}
+            return {"ok": True, "event": event_record(event)}
+        start, end = _moment(request.get("from")), _moment(request.get("to"))
+        if op == "free":
+            if start is None or end is None or end <= start:
+                raise ValueError("free necesita 'from' y 'to', con 'to' despues de 'from'")
+            free, pools = self.shared.free_resources(start, end, request.get("skill"))
+            return {"ok": True, "free": free, "pools": pools}
+        if op == "list":
+            events = self.shared.read(self.planner.events_between, start, end)
+        else:
+            events = self.shared.read(self.planner.agenda, request["resource"], start, end)
+        offset = int(request.get("offset", 0))
+        limit = int(request.get("limit", LIST_LIMIT))
+        return {"ok": True, "total": len(events), "events": [event_record(ev) for ev in events[offset:offset + limit]]}
+
+
+def event_record(event):
+    return {
+        "id": event.ref,
+        "title": event.event_title,
+        "start": event.start_time.isoformat(),
+        "end": event.end_time.isoformat(),
+        "resources": event.required_resources,
+        "client": event.event_metadata.get("client", ""),
+        "status": event.event_metadata.get("status", "pendiente"),
+    }
+
+
+def _moment(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Fecha invalida: '{value}' (usa YYYY-MM-DDTHH:MM:SS)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local JSON de Ctrl + Alt + Repair para varios puestos")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="escucha en este socket Unix en lugar de TCP")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="hilos que procesan las escrituras")
+    parser.add_argument("--batch-limit", type=int, default=BATCH_LIMIT, help="escrituras por lote como maximo")
+    args = parser.parse_args(argv)
+
+    planner = Planner()
+    journal = PlannerJournal(archive=ShardArchive())
+    journal.load(planner)
+    server = PlannerServer(SharedPlanner(planner), journal, args.workers, args.batch_limit)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Escuchando en {where} (Ctrl+C para detener)", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        journal.checkpoint()
+        journal.detach()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
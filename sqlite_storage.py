@@ -0,0 +1,221 @@
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from models import Resource, from_epoch_seconds
+from storage import SAVE_DIR, event_from_record
+
+DEFAULT_DB_FILE = os.path.join(SAVE_DIR, "data.db")
+#Fin usado para las series sin fecha de termino
+OPEN_END = "9999-12-31T23:59:59"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    name TEXT PRIMARY KEY,
+    attributes TEXT
+);
+CREATE TABLE IF NOT EXISTS pools (
+    name TEXT PRIMARY KEY,
+    quantity INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS restrictions (
+    position INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    resource_a TEXT NOT NULL,
+    resource_b TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    span_end TEXT NOT NULL,
+    status TEXT NOT NULL,
+    metadata TEXT,
+    recurrence TEXT
+);
+CREATE TABLE IF NOT EXISTS event_resources (
+    event_id INTEGER NOT NULL REFERENCES events(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    resource_name TEXT NOT NULL,
+    is_series INTEGER NOT NULL,
+    start_time TEXT NOT NULL,
+    span_end TEXT NOT NULL,
+    PRIMARY KEY (event_id, position)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_event_resources_resource_start ON event_resources(resource_name, is_series, start_time);
+CREATE INDEX IF NOT EXISTS idx_events_status ON events(status);
+CREATE INDEX IF NOT EXISTS idx_events_start ON events(start_time);
+"""
+
+
+class SQLiteStorage:
+    #Backend SQLite (sin servidor). Las ocupaciones de cada recurso quedan indexadas por (recurso, inicio)
+    #y el estado por status, asi las consultas de agenda y por rango corren en la base de datos sin cargar
+    #todo el historial en memoria. Los eventos sueltos se buscan con la misma cota que ResourceTimeline:
+    #solo los que empiezan en [inicio - duracion maxima, fin)
+    def __init__(self, filename=DEFAULT_DB_FILE):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    # --- Guardar / cargar el planner completo ---
+    def save(self, planner):
+        with planner.stats.timer("save"):
+            with self.connection:
+                cur = self.connection.cursor()
+                for table in ("event_resources", "events", "restrictions", "pools", "resources", "meta"):
+                    cur.execute(f"DELETE FROM {table}")
+                cur.executemany(
+                    "INSERT INTO resources (name, attributes) VALUES (?, ?)",
+                    ((r.resource_name, json.dumps(r.resource_attributes, ensure_ascii=False)) for r in planner.available_resources.values())
+                )
+                cur.executemany("INSERT INTO pools (name, quantity) VALUES (?, ?)", planner.resource_pools.items())
+                rules = [(kind, a, b) for kind in ("corequisite", "exclusion") for a, b in planner.resource_restrictions.get(kind, [])]
+                cur.executemany(
+                    "INSERT INTO restrictions (position, kind, resource_a, resource_b) VALUES (?, ?, ?, ?)",
+                    ((position, kind, a, b) for position, (kind, a, b) in enumerate(rules))
+                )
+                max_duration = timedelta(0)
+                for ev in planner.scheduled_events:
+                    self._insert_event(cur, ev)
+                    if ev.recurrence_rule() is None:
+                        max_duration = max(max_duration, ev.end_time - ev.start_time)
+                cur.execute("INSERT INTO meta (key, value) VALUES ('max_duration', ?)", (str(max_duration.total_seconds()),))
+
+    def add_event(self, ev):
+        #Alta incremental de un evento ya validado por el planner
+        with self.connection:
+            cur = self.connection.cursor()
+            self._insert_event(cur, ev)
+            if ev.recurrence_rule() is None and ev.end_time - ev.start_time > self._max_duration():
+                cur.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('max_duration', ?)", (str((ev.end_time - ev.start_time).total_seconds()),))
+
+    def _insert_event(self, cur, ev):
+        rule = ev.recurrence_rule()
+        if rule is None:
+            span_end = ev.end_time.isoformat()
+        else:
+            span_end = from_epoch_seconds(rule.end_key).isoformat() if rule.end_key is not None else OPEN_END
+        start = ev.start_time.isoformat()
+        cur.execute(
+            "INSERT INTO events (id, title, start_time, end_time, span_end, status, metadata, recurrence) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (ev.event_id, ev.event_title, start, ev.end_time.isoformat(), span_end, ev.event_metadata.get("status", "pendiente"),
+             json.dumps(ev.event_metadata, ensure_ascii=False), json.dumps(ev.recurrence_pattern) if ev.recurrence_pattern else None)
+        )
+        #Sin id (evento que no paso por el planner) la base asigna uno
+        event_id = cur.lastrowid
+        cur.executemany(
+            "INSERT INTO event_resources (event_id, position, resource_name, is_series, start_time, span_end) VALUES (?, ?, ?, ?, ?, ?)",
+            ((event_id, position, name, int(rule is not None), start, span_end) for position, name in enumerate(ev.required_resources))
+        )
+
+    def load(self, planner, trusted=False, since=None):
+        #since: solo se cargan los eventos (y series) que siguen activos despues de esa fecha
+        with planner.stats.timer("load"):
+            cur = self.connection.cursor()
+            planner.clear_events()
+            planner.clear_resources()
+            for kind, a, b in cur.execute("SELECT kind, resource_a, resource_b FROM restrictions ORDER BY position").fetchall():
+                if kind == "corequisite":
+                    planner.add_corequisite(a, b)
+                else:
+                    planner.add_exclusion(a, b)
+            for name, quantity in cur.execute("SELECT name, quantity FROM pools"):
+                planner.set_pool(name, quantity)
+            for name, attributes in cur.execute("SELECT name, attributes FROM resources"):
+                planner.add_resource(Resource(name, json.loads(attributes) if attributes else None))
+            query = "SELECT id, title, start_time, end_time, metadata, recurrence FROM events"
+            params = ()
+            if since is not None:
+                query += " WHERE span_end > ?"
+                params = (since.isoformat(),)
+            events = self._events(query + " ORDER BY id", params)
+            if trusted:
+                planner.restore_events(events)
+            else:
+                planner.schedule_many(events, atomic=False)
+            return trusted
+
+    # --- Consultas dentro de la base de datos ---
+    def schedule_for_resource(self, resource_name, start=None, end=None):
+        #Agenda de un recurso en [start, end): eventos sueltos por rango indexado y series expandidas en la ventana
+        start = start or datetime.min
+        end = end or datetime.fromisoformat(OPEN_END)
+        lower = (start - self._max_duration()).isoformat() if start - datetime.min > self._max_duration() else datetime.min.isoformat()
+        singles = self._events(
+            "SELECT e.id, e.title, e.start_time, e.end_time, e.metadata, e.recurrence FROM event_resources r JOIN events e ON e.id = r.event_id "
+            "WHERE r.resource_name = ? AND r.is_series = 0 AND r.start_time >= ? AND r.start_time < ? AND e.end_time > ? ORDER BY r.start_time",
+            (resource_name, lower, end.isoformat(), start.isoformat())
+        )
+        series = self._events(
+            "SELECT e.id, e.title, e.start_time, e.end_time, e.metadata, e.recurrence FROM event_resources r JOIN events e ON e.id = r.event_id "
+            "WHERE r.resource_name = ? AND r.is_series = 1 AND r.start_time < ? AND r.span_end > ?",
+            (resource_name, end.isoformat(), start.isoformat())
+        )
+        occurrences = [occ for master in series for occ in self._window(master, start, end)]
+        return sorted(singles + occurrences, key=lambda e: e.start_time)
+
+    def events_between(self, start, end):
+        #Igual que schedule_for_resource: los eventos sueltos con la cota de la duracion maxima y las series por su tramo
+        lower = (start - self._max_duration()).isoformat() if start - datetime.min > self._max_duration() else datetime.min.isoformat()
+        singles = self._events(
+            "SELECT id, title, start_time, end_time, metadata, recurrence FROM events "
+            "WHERE recurrence IS NULL AND start_time >= ? AND start_time < ? AND end_time > ? ORDER BY start_time",
+            (lower, end.isoformat(), start.isoformat())
+        )
+        series = self._events(
+            "SELECT id, title, start_time, end_time, metadata, recurrence FROM events "
+            "WHERE recurrence IS NOT NULL AND start_time < ? AND span_end > ?",
+            (end.isoformat(), start.isoformat())
+        )
+        occurrences = [occ for master in series for occ in self._window(master, start, end)]
+        return sorted(singles + occurrences, key=lambda e: e.start_time)
+
+    def events_by_status(self, status):
+        return self._events(
+            "SELECT id, title, start_time, end_time, metadata, recurrence FROM events WHERE status = ? ORDER BY start_time",
+            (status,)
+        )
+
+    def _window(self, ev, start, end):
+        if ev.recurrence_rule() is None:
+            return [ev] if ev.start_time < end and ev.end_time > start else []
+        return ev.generate_recurrence_occurrences(start, end)
+
+    def _events(self, query, params=()):
+        rows = self.connection.execute(query, params).fetchall()
+        if not rows:
+            return []
+        ids = [row[0] for row in rows]
+        resources = {}
+        for chunk_start in range(0, len(ids), 500):
+            chunk = ids[chunk_start:chunk_start + 500]
+            marks = ",".join("?" * len(chunk))
+            for event_id, name in self.connection.execute(
+                f"SELECT event_id, resource_name FROM event_resources WHERE event_id IN ({marks}) ORDER BY event_id, position", chunk
+            ):
+                resources.setdefault(event_id, []).append(name)
+        return [
+            event_from_record({
+                "id": event_id,
+                "title": title,
+                "start": start,
+                "end": end,
+                "resources": resources.get(event_id, []),
+                "metadata": json.loads(metadata) if metadata else {},
+                "recurrence": json.loads(recurrence) if recurrence else None,
+            }) for event_id, title, start, end, metadata, recurrence in rows
+        ]
+
+    def _max_duration(self):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'max_duration'").fetchone()
+        return timedelta(seconds=float(row[0])) if row else timedelta(0)
@@ -1,5 +1,7 @@
+import hashlib
 import json
 import os
+import re
 from datetime import datetime
 from models import Event, Resource
 
@@ -9,48 +11,118 @@ os.makedirs(SAVE_DIR, exist_ok=True)
 
 DEFAULT_FILE = os.path.join(SAVE_DIR, "data.json")
 
-def save_planner_state(planner, filename=DEFAULT_FILE):
-    data = {
+#Partes del estado que cubre el checksum del snapshot
+SNAPSHOT_KEYS = ("resources", "events", "restrictions", "pools")
+#Archivos antiguos guardaban cada ocurrencia expandida ("Titulo (#n)") junto con su regla
+LEGACY_OCCURRENCE_TITLE = re.compile(r" \(#\d+\)$")
+
+def state_checksum(data):
+    payload = json.dumps({key: data.get(key) for key in SNAPSHOT_KEYS}, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def planner_state(planner):
+    return {
         "resources": [
             {"name": r.resource_name, "attributes": r.resource_attributes}
             for r in planner.available_resources.values()
         ],
-        "events": [
-            {
-                "title": ev.event_title,
-                "start": ev.start_time.isoformat(),
-                "end": ev.end_time.isoformat(),
-                "resources": ev.required_resources,
-                "metadata": ev.event_metadata,
-                "recurrence": ev.recurrence_pattern
-            } for ev in planner.scheduled_events
-        ],
+        "events": [event_record(ev) for ev in planner.scheduled_events],
         "restrictions": planner.resource_restrictions,
         "pools": planner.resource_pools,
+        #Los ids de eventos archivados no se vuelven a usar aunque ya no esten en el snapshot
+        "next_id": planner._next_event_id,
+    }
+
+def save_planner_state(planner, filename=DEFAULT_FILE, indent=2, journal_seq=None):
+    with planner.stats.timer("save"):
+        data = planner_state(planner)
+        data["checksum"] = state_checksum(data)
+        if journal_seq is not None:
+            data["journal_seq"] = journal_seq
+        #Se escribe en un archivo temporal y se reemplaza al final: un fallo a mitad no deja el archivo roto
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+
+def event_record(ev):
+    return {
+        "id": ev.event_id,
+        "title": ev.event_title,
+        "start": ev.start_time.isoformat(),
+        "end": ev.end_time.isoformat(),
+        "resources": ev.required_resources,
+        "metadata": ev.event_metadata,
+        "recurrence": ev.recurrence_pattern
     }
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
         
-def load_planner_state(planner, filename =DEFAULT_FILE):
+def load_planner_state(planner, filename =DEFAULT_FILE, trusted=False):
+    #trusted=True: si el checksum del snapshot coincide, los eventos se restauran directo en los indices
+    #sin volver a validarlos. Sin checksum (o si no coincide) se validan todos como siempre
+    with planner.stats.timer("load"):
+        return apply_state(planner, read_state_file(filename), trusted)
+
+def read_state_file(filename=DEFAULT_FILE):
     with open(filename, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
-    planner.scheduled_events.clear()
-    planner.available_resources.clear()
-    planner.resource_restrictions = data.get("restrictions", {"corequisite": [], "exclusion": []})
-    planner.resource_pools = data.get("pools", {})
+        return json.load(f)
+
+def apply_state(planner, data, trusted=False):
+    planner.clear_events()
+    planner.clear_resources()
+    restrictions = data.get("restrictions", {})
+    for a, b in restrictions.get("corequisite", []):
+        planner.add_corequisite(a, b)
+    for a, b in restrictions.get("exclusion", []):
+        planner.add_exclusion(a, b)
+    for pool, qty in data.get("pools", {}).items():
+        planner.set_pool(pool, qty)
     
     for r in data.get("resources", []):
         planner.add_resource(Resource(r["name"], r.get("attributes")))
     
-    for e in data.get("events", []):
-        event = Event(
-            e["title"],
-            datetime.fromisoformat(e["start"]),
-            datetime.fromisoformat(e["end"]),
-            e["resources"],
-            e.get("metadata"),
-            e.get("recurrence")
-        )
-        ok, _ = planner.schedule_event(event)
-                
\ No newline at end of file
+    events = [event_from_record(e) for e in data.get("events", [])]
+    #Archivos anteriores a los ids: se numeran en el orden del archivo, igual en cargas normales y de confianza
+    planner.assign_event_ids(events)
+    planner._next_event_id = max(planner._next_event_id, data.get("next_id", 1))
+    if trusted and data.get("checksum") == state_checksum(data):
+        planner.restore_events(events)
+        return True
+    planner.schedule_many(events, atomic=False)
+    return False
+
+def event_from_record(e):
+    recurrence = e.get("recurrence")
+    if recurrence and LEGACY_OCCURRENCE_TITLE.search(e["title"]):
+        #Ocurrencia ya expandida: se carga tal cual, sin volver a generar su serie
+        recurrence = None
+    return Event(
+        e["title"],
+        datetime.fromisoformat(e["start"]),
+        datetime.fromisoformat(e["end"]),
+        e["resources"],
+        e.get("metadata"),
+        recurrence,
+        event_id=e.get("id")
+    )
+
+
+class JsonStorage:
+    #Backend por defecto: un archivo JSON con todo el estado.
+    #Todos los backends exponen save(planner) y load(planner, trusted)
+    def __init__(self, filename=DEFAULT_FILE):
+        self.filename = filename
+
+    def save(self, planner):
+        save_planner_state(planner, self.filename)
+
+    def load(self, planner, trusted=False):
+        return load_planner_state(planner, self.filename, trusted)
+
+def open_storage(filename=DEFAULT_FILE):
+    #Elige el backend por la extension del archivo (.db / .sqlite => SQLite)
+    if filename.endswith((".db", ".sqlite", ".sqlite3")):
+        from sqlite_storage import SQLiteStorage
+        return SQLiteStorage(filename)
+    return JsonStorage(filename)
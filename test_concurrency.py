@@ -0,0 +1,94 @@
+import random
+import sys
+import threading
+import unittest
+from datetime import datetime, timedelta
+from models import Event, Resource
+from planner import Planner
+from concurrency import SharedPlanner
+
+#Prueba de estres del SharedPlanner: lectores sin lock (events_between, agenda, get_event, scheduled_events)
+#contra reservas y bajas concurrentes. Ninguna excepcion de una lectura cruzada con un commit debe llegar al
+#llamador, y al final el planner tiene que quedar consistente. Uso: python -m unittest test_concurrency
+
+RESOURCES = [f"R{i}" for i in range(6)]
+BASE = datetime(2030, 1, 1)
+WRITERS = 3
+READERS = 3
+WRITES = 500
+
+
+class SharedPlannerStressTest(unittest.TestCase):
+    def setUp(self):
+        #Cambios de hilo mucho mas seguidos, para que las lecturas caigan en medio de los commits
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def test_readers_never_see_torn_state(self):
+        for seed in range(5):
+            planner = Planner()
+            planner.set_pool("Banco", 2)
+            for name in RESOURCES:
+                planner.add_resource(Resource(name, {"type": "tech", "skills": []}))
+            shared = SharedPlanner(planner)
+            errors = []
+            done = threading.Event()
+
+            def writer(rnd):
+                try:
+                    for k in range(WRITES):
+                        start = BASE + timedelta(minutes=30 * rnd.randrange(2000))
+                        recurrence = {"freq": "daily", "count": rnd.randint(2, 4)} if rnd.random() < 0.15 else None
+                        resources = rnd.sample(RESOURCES + ["Banco"], rnd.randint(1, 2))
+                        shared.schedule_event(Event("t", start, start + timedelta(minutes=30 * rnd.randint(1, 4)), resources,
+                                                    recurrence_pattern=recurrence))
+                        if rnd.random() < 0.3:
+                            events = shared.read(lambda: list(planner.scheduled_events))
+                            if events:
+                                shared.write(planner.remove_event, rnd.choice(events), "series")
+                except Exception as e:
+                    errors.append(e)
+
+            def reader(rnd):
+                try:
+                    while not done.is_set():
+                        start = BASE + timedelta(hours=rnd.randrange(1000))
+                        end = start + timedelta(hours=rnd.randint(1, 48))
+                        shared.read(planner.events_between, start, end)
+                        shared.read(planner.agenda, rnd.choice(RESOURCES), start, end)
+                        events = shared.read(lambda: list(planner.scheduled_events))
+                        if events:
+                            ev = rnd.choice(events)
+                            ref = f"{ev.ref}#{rnd.randint(1, 3)}" if ev.recurrence_rule() is not None else ev.ref
+                            shared.read(planner.get_event, ref)
+                except Exception as e:
+                    errors.append(e)
+
+            rnd = random.Random(seed)
+            writers = [threading.Thread(target=writer, args=(random.Random(rnd.random()),)) for i in range(WRITERS)]
+            readers = [threading.Thread(target=reader, args=(random.Random(rnd.random()),)) for i in range(READERS)]
+            for thread in writers + readers:
+                thread.start()
+            for thread in writers:
+                thread.join()
+            done.set()
+            for thread in readers:
+                thread.join()
+
+            self.assertEqual(errors, [])
+            scheduled = planner.scheduled_events
+            self.assertEqual(scheduled, sorted(planner.events_by_id.values(), key=lambda ev: planner._event_sequence[id(ev)]))
+            self.assertEqual(len(planner.events_between()), sum(1 if ev.recurrence_rule() is None else
+                                                                 len(ev.generate_recurrence_occurrences(BASE, BASE + timedelta(days=400)))
+                                                                 for ev in scheduled))
+            for name in RESOURCES:
+                agenda = planner.agenda(name)
+                self.assertFalse(any(a.end_time > b.start_time for a, b in zip(agenda, agenda[1:])), name)
+            self.assertLessEqual(planner.pool_units_in_use("Banco", BASE, BASE + timedelta(days=400)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+from bisect import bisect_left, insort
+
+
+class ResourceTimeline:
+    #Linea de tiempo de un recurso, ordenada por hora de inicio (segundos desde la epoca).
+    #Cada entrada es (inicio, secuencia, fin, evento); la secuencia es el orden de alta en el planner
+    def __init__(self):
+        self._entries = []
+        self._max_duration = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, event, sequence):
+        insort(self._entries, (event.start_key, sequence, event.end_key, event))
+        duration = event.end_key - event.start_key
+        if duration > self._max_duration:
+            self._max_duration = duration
+
+    def extend(self, entries):
+        #Carga masiva de (secuencia, evento): un solo ordenamiento al final
+        for sequence, event in entries:
+            self._entries.append((event.start_key, sequence, event.end_key, event))
+            duration = event.end_key - event.start_key
+            if duration > self._max_duration:
+                self._max_duration = duration
+        self._entries.sort(key=lambda entry: entry[:2])
+
+    def remove(self, event, sequence):
+        idx = bisect_left(self._entries, (event.start_key, sequence))
+        if idx < len(self._entries) and self._entries[idx][1] == sequence:
+            del self._entries[idx]
+
+    def _span(self, start_key, end_key):
+        #Solo pueden solaparse las entradas que empiezan antes de end_key y no antes de
+        #start_key - duracion maxima, asi que basta con revisar ese tramo: O(log n + k).
+        #end_key=None significa sin limite hacia adelante
+        lo = bisect_left(self._entries, (start_key - self._max_duration,))
+        hi = len(self._entries) if end_key is None else bisect_left(self._entries, (end_key,))
+        return lo, hi
+
+    def count_overlapping(self, start_key, end_key):
+        #Cota superior (sin recorrer las entradas) de cuantas entradas se solapan con el intervalo
+        lo, hi = self._span(start_key, end_key)
+        return max(hi - lo, 0)
+
+    def overlapping(self, start_key, end_key):
+        lo, hi = self._span(start_key, end_key)
+        for entry_start, sequence, entry_end, event in self._entries[lo:hi]:
+            if entry_end > start_key:
+                yield sequence, event
+
+    def iter_overlapping(self, start_key, end_key):
+        #Como overlapping pero sin copiar el tramo: recorre por indice (para exportar rangos grandes)
+        lo, hi = self._span(start_key, end_key)
+        for index in range(lo, hi):
+            entry_start, sequence, entry_end, event = self._entries[index]
+            if entry_end > start_key:
+                yield event
+
+    def events(self):
+        return [entry[3] for entry in self._entries]
+
+    def earliest_free(self, start_key, duration):
+        #Salta de bloque ocupado en bloque ocupado hasta encontrar un hueco de al menos duration
+        while True:
+            busy_until = None
+            for sequence, event in self.overlapping(start_key, start_key + duration):
+                if busy_until is None or event.end_key > busy_until:
+                    busy_until = event.end_key
+            if busy_until is None:
+                return start_key
+            start_key = busy_until
+
+
+#El arbol cubre 2**TIME_BITS segundos a partir del 01-01-0001 (TIME_OFFSET segundos antes de la epoca Unix)
+TIME_BITS = 39
+TIME_OFFSET = 62135596800
+
+
+class PoolOccupancy:
+    #Arbol de segmentos implicito (nodos creados bajo demanda) sobre el eje de tiempo en segundos.
+    #Cada reserva suma sus unidades en [inicio, fin) y max_in_use responde el maximo de unidades
+    #ocupadas simultaneamente en un intervalo, ambos en O(log U) sin importar cuantas reservas haya
+    def __init__(self):
+        #El nodo 0 es el nodo nulo (ocupacion 0), el nodo 1 es la raiz
+        self._left = [0, 0]
+        self._right = [0, 0]
+        self._max = [0, 0]
+        self._lazy = [0, 0]
+        self._size = 1 << TIME_BITS
+        #Reservas cargadas en bloque que aun no entran al arbol (se insertan en la primera consulta)
+        self._pending = []
+
+    def add(self, start_key, end_key, units=1):
+        self._flush()
+        self._add(1, 0, self._size, start_key + TIME_OFFSET, end_key + TIME_OFFSET, units)
+
+    def add_deferred(self, start_key, end_key, units=1):
+        self._pending.append((start_key, end_key, units))
+
+    def remove(self, start_key, end_key, units=1):
+        self._flush()
+        self._add(1, 0, self._size, start_key + TIME_OFFSET, end_key + TIME_OFFSET, -units)
+
+    def max_in_use(self, start_key, end_key):
+        self._flush()
+        return self._query(1, 0, self._size, start_key + TIME_OFFSET, end_key + TIME_OFFSET)
+
+    def _flush(self):
+        if self._pending:
+            pending, self._pending = self._pending, []
+            for start_key, end_key, units in pending:
+                self._add(1, 0, self._size, start_key + TIME_OFFSET, end_key + TIME_OFFSET, units)
+
+    def earliest_free(self, start_key, duration, capacity, units=1):
+        #Primer instante >= start_key en el que quedan 'units' unidades libres durante todo duration.
+        #Mientras el intervalo tenga un instante lleno se salta justo despues del ultimo instante lleno
+        threshold = capacity - units + 1
+        if threshold <= 0:
+            return None
+        self._flush()
+        lo = start_key + TIME_OFFSET
+        while lo + duration <= self._size:
+            last_full = self._last_at_least(1, 0, self._size, lo, lo + duration, threshold, 0)
+            if last_full is None:
+                return lo - TIME_OFFSET
+            lo = last_full + 1
+        return None
+
+    def last_at_least(self, start_key, end_key, threshold):
+        #Ultimo instante de [start_key, end_key) con al menos 'threshold' unidades en uso (None si no hay)
+        self._flush()
+        found = self._last_at_least(1, 0, self._size, start_key + TIME_OFFSET, end_key + TIME_OFFSET, threshold, 0)
+        return None if found is None else found - TIME_OFFSET
+
+    def _last_at_least(self, node, node_lo, node_hi, lo, hi, threshold, inherited):
+        if not node:
+            return min(hi, node_hi) - 1 if inherited >= threshold else None
+        if inherited + self._max[node] < threshold:
+            return None
+        if node_hi - node_lo == 1:
+            return node_lo
+        inherited += self._lazy[node]
+        mid = (node_lo + node_hi) // 2
+        if hi > mid:
+            found = self._last_at_least(self._right[node], mid, node_hi, lo, hi, threshold, inherited)
+            if found is not None:
+                return found
+        if lo < mid:
+            return self._last_at_least(self._left[node], node_lo, mid, lo, hi, threshold, inherited)
+        return None
+
+    def _new_node(self):
+        self._left.append(0)
+        self._right.append(0)
+        self._max.append(0)
+        self._lazy.append(0)
+        return len(self._max) - 1
+
+    def _add(self, node, node_lo, node_hi, lo, hi, units):
+        if lo <= node_lo and node_hi <= hi:
+            self._max[node] += units
+            self._lazy[node] += units
+            return
+        mid = (node_lo + node_hi) // 2
+        if lo < mid:
+            if not self._left[node]:
+                self._left[node] = self._new_node()
+            self._add(self._left[node], node_lo, mid, lo, hi, units)
+        if hi > mid:
+            if not self._right[node]:
+                self._right[node] = self._new_node()
+            self._add(self._right[node], mid, node_hi, lo, hi, units)
+        self._max[node] = self._lazy[node] + max(self._max[self._left[node]], self._max[self._right[node]])
+
+    def _query(self, node, node_lo, node_hi, lo, hi):
+        if not node:
+            return 0
+        if lo <= node_lo and node_hi <= hi:
+            return self._max[node]
+        mid = (node_lo + node_hi) // 2
+        best = 0
+        if lo < mid:
+            best = self._query(self._left[node], node_lo, mid, lo, hi)
+        if hi > mid:
+            best = max(best, self._query(self._right[node], mid, node_hi, lo, hi))
+        return self._lazy[node] + best
+
+
+class AvailabilityMatrix:
+    #Disponibilidad por franjas fijas (slot segundos) desde origin: cada recurso tiene una fila guardada como
+    #entero usado de bitset, con el bit i encendido si alguna reserva toca la franja i. Quien esta libre en un
+    #rango es un AND por fila con la mascara de sus franjas, y los huecos comunes salen del OR de varias filas
+    def __init__(self, origin, slot, slots):
+        self.origin = origin
+        self.slot = slot
+        self.slots = slots
+        self.end = origin + slot * slots
+        self.rows = {}
+
+    def covers(self, start_key, end_key):
+        return self.origin <= start_key and end_key <= self.end
+
+    def span(self, start_key, end_key):
+        #Franjas [lo, hi) que toca el intervalo, recortadas al horizonte
+        lo = max((start_key - self.origin) // self.slot, 0)
+        hi = min(-((self.origin - end_key) // self.slot), self.slots)
+        return lo, max(lo, hi)
+
+    def mask(self, lo, hi):
+        return ((1 << (hi - lo)) - 1) << lo
+
+    def mark(self, rid, start_key, end_key):
+        lo, hi = self.span(start_key, end_key)
+        if lo < hi:
+            self.rows[rid] = self.rows.get(rid, 0) | self.mask(lo, hi)
+
+    def clear(self, rid, lo, hi):
+        if rid in self.rows:
+            self.rows[rid] &= ~self.mask(lo, hi)
+
+    def row(self, rid):
+        return self.rows.get(rid, 0)
+
+    def slot_start(self, index):
+        return self.origin + index * self.slot
+
+    def free_runs(self, busy, lo, hi):
+        #Tramos [a, b) de franjas en 0 de busy dentro de [lo, hi)
+        free = ~busy & self.mask(lo, hi)
+        while free:
+            first = (free & -free).bit_length() - 1
+            run = free >> first
+            length = (~run & (run + 1)).bit_length() - 1
+            yield first, first + length
+            free &= ~self.mask(first, first + length)